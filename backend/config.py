@@ -10,7 +10,37 @@ class Settings(BaseSettings):
     api_port: int = 8000
     debug: bool = False
     latex_timeout: int = 60
+    latex_max_passes: int = 3
+    latex_draft_first_pass: bool = True
+    preview_low_dpi: int = 72
+    preview_high_dpi: int = 150
+    compile_max_jobs: int = 4
+    compile_max_queue: int = 32
+    compile_backend: str = "local"
+    compile_job_timeout: int = 120
+    compile_job_ttl: int = 3600
+    export_max_parallel: int = 3
+    io_workers: int = 8
+    image_workers: int = 2
+    loop_lag_interval: float = 0.5
     temp_dir: str = "/tmp/latex_compile"
+    work_dir_root: str = "/dev/shm/latex_compile"
+    cache_enabled: bool = True
+    cache_dir: str = "/tmp/latex_cache"
+    cache_max_bytes: int = 256 * 1024 * 1024
+    compile_failure_ttl: int = 60
+    compile_session_ttl: int = 900
+    compile_session_max: int = 32
+    sandbox_enabled: bool = True
+    sandbox_cpu_seconds: int = 30
+    sandbox_memory_bytes: int = 2 * 1024 * 1024 * 1024
+    sandbox_output_bytes: int = 64 * 1024 * 1024
+    sandbox_max_processes: int = 0
+    preamble_format_enabled: bool = True
+    warmup_enabled: bool = True
+    pdf_optimize: bool = True
+    latex_fragment_cache_size: int = 4096
+    format_dir: str = "/tmp/latex_formats"
 
 
 @lru_cache()
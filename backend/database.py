@@ -40,3 +40,7 @@ def get_profiles_collection():
 
 def get_resumes_collection():
     return get_database()["resumes"]
+
+
+def get_compile_jobs_collection():
+    return get_database()["compile_jobs"]
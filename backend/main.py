@@ -1,19 +1,62 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from .config import get_settings
 from .database import close_database_connection, connect_to_database
 from .routers import compile_router, profiles_router, resumes_router
+from .services import compile_queue
+from .services.latex_compiler import get_cache_stats, get_scheduler_stats
+from .services.loop_monitor import LoopLagMonitor
+from .services.metrics import CONTENT_TYPE, render_metrics
+from .services.template_engine import get_fragment_stats
+from .services.warmup import warm_up
+
+settings = get_settings()
+loop_monitor = LoopLagMonitor(settings.loop_lag_interval)
+# Set once the toolchain is warm; /ready reports it
+warmed_up = asyncio.Event()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_to_database()
+    await compile_queue.ensure_indexes()
+    tasks = []
+    if settings.compile_backend != "queue":
+        tasks.append(asyncio.create_task(_warm_up()))
+        # Workers requeue stale jobs in queue mode; here the detached jobs
+        # of a stopped API process are failed instead
+        tasks.append(asyncio.create_task(_fail_stale_jobs()))
+    else:
+        # Compiles run in the workers, which warm up on their own
+        warmed_up.set()
+    loop_monitor.start()
     yield
+    await loop_monitor.stop()
+    for task in tasks:
+        task.cancel()
     await close_database_connection()
 
 
+async def _warm_up() -> None:
+    try:
+        await warm_up()
+    finally:
+        warmed_up.set()
+
+
+async def _fail_stale_jobs() -> None:
+    while True:
+        failed = await compile_queue.fail_stale(compile_queue.stale_after())
+        if failed:
+            print(f"Failed {failed} compile jobs interrupted by a restart")
+        await asyncio.sleep(compile_queue.STALE_CHECK_SECONDS)
+
+
 app = FastAPI(
     title="Resume Builder API",
     description="API for creating and managing resumes with LaTeX compilation",
@@ -39,6 +82,53 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    if not warmed_up.is_set():
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+    return {"status": "ready"}
+
+
+@app.get("/loop/stats")
+async def loop_stats():
+    return loop_monitor.stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    scheduler = get_scheduler_stats()
+    cache = await get_cache_stats()
+    loop = loop_monitor.stats()
+    fragments = get_fragment_stats()
+
+    gauges = {
+        "resume_event_loop_lag_seconds": loop["last_ms"] / 1000,
+        "resume_event_loop_lag_max_seconds": loop["max_ms"] / 1000,
+        "resume_compile_active": scheduler["active"],
+        "resume_compile_waiting": scheduler["waiting"],
+        "resume_compile_in_flight": scheduler["single_flight"]["in_flight"],
+        "resume_compile_sessions": scheduler["sessions"]["active"],
+        "resume_latex_fragments": fragments["entries"],
+    }
+    counters = {
+        "resume_compile_completed_total": scheduler["completed"],
+        "resume_compile_rejected_total": scheduler["rejected"],
+        "resume_compile_coalesced_total": scheduler["single_flight"]["coalesced"],
+        "resume_compile_failure_cache_hits_total": cache["failures"]["hits"],
+        "resume_latex_fragment_hits_total": fragments["hits"],
+        "resume_latex_fragment_misses_total": fragments["misses"],
+    }
+    for resource, count in scheduler["limit_breaches"].items():
+        counters[f"resume_compile_{resource}_limit_exceeded_total"] = count
+    if cache["enabled"]:
+        gauges["resume_compile_cache_bytes"] = cache["bytes"]
+        counters["resume_compile_cache_hits_total"] = cache["hits"]
+        counters["resume_compile_cache_misses_total"] = cache["misses"]
+        counters["resume_compile_cache_evictions_total"] = cache["evictions"]
+
+    return PlainTextResponse(render_metrics(gauges, counters), media_type=CONTENT_TYPE)
+
+
 @app.get("/")
 async def root():
     return {
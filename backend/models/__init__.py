@@ -1,3 +1,4 @@
+from .compile_job import CompileJob, CompileJobCreate
 from .profile import Profile, ProfileCreate, ProfileUpdate
 from .resume import Resume, ResumeCreate, ResumeUpdate
 from .sections import (
@@ -11,6 +12,8 @@ from .sections import (
 )
 
 __all__ = [
+    "CompileJob",
+    "CompileJobCreate",
     "Profile",
     "ProfileCreate",
     "ProfileUpdate",
@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from .sections import ResumeData
+
+
+class CompileJobCreate(BaseModel):
+    data: Optional[ResumeData] = Field(None, description="Resume data to compile")
+    latex: Optional[str] = Field(
+        None, description="Raw LaTeX source, used when no resume data is given"
+    )
+    output: Literal["pdf", "preview"] = Field(
+        "pdf", description="Produce the PDF or a WebP preview of the first page"
+    )
+
+
+class CompileJob(BaseModel):
+    id: str = Field(..., description="Unique job ID")
+    status: Literal["queued", "running", "done", "failed"] = Field(
+        ..., description="Current job state"
+    )
+    output: Literal["pdf", "preview"] = Field(..., description="Requested artifact")
+    created_at: datetime = Field(..., description="Submission timestamp")
+    finished_at: Optional[datetime] = Field(None, description="Completion timestamp")
+    expires_at: Optional[datetime] = Field(
+        None, description="When the job and its result are removed"
+    )
+    document_id: Optional[str] = Field(
+        None, description="Compiled document ID, usable for page previews"
+    )
+    page_count: Optional[int] = Field(None, description="Pages in the document")
+    error: Optional[dict] = Field(None, description="Failure details")
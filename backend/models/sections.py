@@ -108,6 +108,7 @@ SectionKey = str
 
 
 class ResumeData(BaseModel):
+    template: str = Field("classic", description="Name of the LaTeX template")
     heading: PersonalInfo
     education: EducationSection = Field(default_factory=lambda: EducationSection())
     skills: SkillsSection = Field(default_factory=lambda: SkillsSection())
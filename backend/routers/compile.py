@@ -1,28 +1,78 @@
 import base64
+from dataclasses import asdict
+from typing import Literal, Optional
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
-from fastapi.responses import Response
+from fastapi import APIRouter, File, HTTPException, Path, Query, UploadFile
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
+from ..models.compile_job import CompileJob, CompileJobCreate
 from ..models.sections import ResumeData
-from ..services.latex_compiler import compile_latex_to_pdf, compile_latex_to_webp
-from ..services.template_engine import generate_latex
+from ..services import compile_queue
+from ..services.latex_compiler import (
+    PREVIEW_TIERS,
+    CompileQueueFull,
+    CompileResult,
+    DocumentNotFound,
+    LatexCompileError,
+    compile_latex_to_pdf_file,
+    compile_latex_to_webp,
+    error_from_job,
+    get_cache_stats,
+    get_scheduler_stats,
+    render_pdf_page,
+    submit_compile_job,
+)
+from ..services.metrics import server_timing
+from ..services.sandbox import ResourceLimitExceeded
+from ..services.template_engine import (
+    find_field,
+    generate_latex,
+    get_fragment_stats,
+    iter_latex,
+    list_templates,
+)
+from ..services.template_registry import UnknownTemplate
 
 router = APIRouter()
 
 
+class _CompiledFileResponse(FileResponse):
+    """FileResponse that releases the compile work directory once sent."""
+
+    def __init__(self, result: CompileResult, **kwargs):
+        super().__init__(result.path, **kwargs)
+        self.release = result.release
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.release is not None:
+                await self.release()
+
+
 @router.post("/compile")
 async def compile_latex(latex: UploadFile = File(...)):
     try:
         latex_content = await latex.read()
         latex_text = latex_content.decode("utf-8")
 
-        webp_bytes = await compile_latex_to_webp(latex_text)
+        result = await compile_latex_to_webp(latex_text)
 
         return Response(
-            content=webp_bytes,
+            content=result.data,
             media_type="image/webp",
-            headers={"Content-Disposition": "attachment; filename=preview.webp"},
+            headers={
+                "Content-Disposition": "attachment; filename=preview.webp",
+                **_compile_headers(result),
+            },
         )
+    except LatexCompileError as e:
+        raise _compile_failed(e, latex_text)
+    except ResourceLimitExceeded as e:
+        raise _limit_exceeded(e)
+    except CompileQueueFull as e:
+        raise _queue_full(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Compilation failed: {str(e)}")
 
@@ -33,36 +83,282 @@ async def generate_pdf(latex: UploadFile = File(...)):
         latex_content = await latex.read()
         latex_text = latex_content.decode("utf-8")
 
-        pdf_bytes = await compile_latex_to_pdf(latex_text)
+        result = await compile_latex_to_pdf_file(latex_text)
+        headers = _compile_headers(result)
 
-        return Response(
-            content=pdf_bytes,
+        if result.path is None:
+            return Response(
+                content=result.data,
+                media_type="application/pdf",
+                headers={
+                    "Content-Disposition": "attachment; filename=resume.pdf",
+                    **headers,
+                },
+            )
+        # Streamed from disk with Content-Length and Range support
+        return _CompiledFileResponse(
+            result,
             media_type="application/pdf",
-            headers={"Content-Disposition": "attachment; filename=resume.pdf"},
+            filename="resume.pdf",
+            headers=headers,
         )
+    except LatexCompileError as e:
+        raise _compile_failed(e, latex_text)
+    except ResourceLimitExceeded as e:
+        raise _limit_exceeded(e)
+    except CompileQueueFull as e:
+        raise _queue_full(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
 
 
 @router.post("/compile-data")
-async def compile_from_data(data: ResumeData):
+async def compile_from_data(
+    data: ResumeData,
+    response: Response,
+    resume_id: Optional[str] = Query(None, max_length=64),
+):
     try:
-        latex_text = generate_latex(data)
-        webp_bytes = await compile_latex_to_webp(latex_text)
+        timings: dict[str, float] = {}
+        latex_text = generate_latex(data, timings)
+        # The quick low tier comes first; sharper pages are fetched on demand
+        result = await compile_latex_to_webp(
+            latex_text, dpi=PREVIEW_TIERS["low"], session_id=resume_id
+        )
+        timings.update(result.timings)
+        response.headers.update(_compile_headers(result, timings))
 
-        base64_image = base64.b64encode(webp_bytes).decode("utf-8")
+        base64_image = base64.b64encode(result.data).decode("utf-8")
 
-        return {"image": base64_image, "latex": latex_text}
+        return {
+            "image": base64_image,
+            "latex": latex_text,
+            "document_id": result.document_id,
+            "page_count": result.page_count,
+            "dpi": PREVIEW_TIERS["low"],
+            "tiers": PREVIEW_TIERS,
+            "passes": result.passes,
+            "cached": result.cached,
+            "coalesced": result.coalesced,
+            "timings": {
+                stage: round(seconds * 1000, 1) for stage, seconds in timings.items()
+            },
+        }
+    except LatexCompileError as e:
+        raise _compile_failed(e, latex_text, data)
+    except UnknownTemplate as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ResourceLimitExceeded as e:
+        raise _limit_exceeded(e)
+    except CompileQueueFull as e:
+        raise _queue_full(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Compilation failed: {str(e)}")
 
 
+@router.get("/documents/{document_id}/pages/{page}")
+async def get_document_page(
+    document_id: str = Path(..., pattern="^[0-9a-f]{64}$"),
+    page: int = Path(..., ge=1),
+    # Only the preview tiers, so a caller cannot fill the cache with one
+    # render per resolution or ask for huge rasters
+    tier: Literal["low", "high"] = Query("high"),
+):
+    try:
+        result = await render_pdf_page(document_id, page, PREVIEW_TIERS[tier])
+    except DocumentNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ResourceLimitExceeded as e:
+        raise _limit_exceeded(e)
+    except CompileQueueFull as e:
+        raise _queue_full(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Rendering failed: {str(e)}")
+
+    return Response(
+        content=result.data,
+        media_type="image/webp",
+        headers={
+            # Documents are content-addressed, so a page never changes
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "X-Page-Count": str(result.page_count),
+            **_compile_headers(result),
+        },
+    )
+
+
+@router.post("/compile-jobs", response_model=CompileJob, status_code=202)
+async def create_compile_job(job: CompileJobCreate, response: Response):
+    if job.data is not None:
+        try:
+            latex_text = generate_latex(job.data)
+        except UnknownTemplate as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif job.latex:
+        latex_text = job.latex
+    else:
+        raise HTTPException(status_code=400, detail="Either data or latex is required")
+
+    try:
+        job_id = await submit_compile_job(
+            latex_text, "webp" if job.output == "preview" else "pdf"
+        )
+    except CompileQueueFull as e:
+        raise _queue_full(e)
+
+    response.headers["Location"] = f"/compile-jobs/{job_id}"
+    return _compile_job(await compile_queue.get(job_id))
+
+
+@router.get("/compile-jobs/{job_id}", response_model=CompileJob)
+async def get_compile_job(job_id: str):
+    doc = await compile_queue.get(job_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Compile job not found")
+    return _compile_job(doc)
+
+
+@router.get("/compile-jobs/{job_id}/result")
+async def get_compile_job_result(job_id: str):
+    doc = await compile_queue.get(job_id, with_result=True)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Compile job not found")
+
+    if doc["status"] == "failed":
+        error = error_from_job(doc["error"])
+        if isinstance(error, LatexCompileError):
+            raise _compile_failed(error, doc["latex"])
+        if isinstance(error, ResourceLimitExceeded):
+            raise _limit_exceeded(error)
+        if isinstance(error, CompileQueueFull):
+            raise _queue_full(error)
+        raise HTTPException(status_code=500, detail=f"Compilation failed: {error}")
+
+    if doc["status"] != "done":
+        raise HTTPException(
+            status_code=409,
+            detail="Compile job has not finished yet",
+            headers={"Retry-After": "1"},
+        )
+
+    result = doc["result"]
+    if doc["kind"] == "webp":
+        media_type, filename = "image/webp", "preview.webp"
+    else:
+        media_type, filename = "application/pdf", "resume.pdf"
+
+    return Response(
+        content=result["data"],
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Compile-Passes": str(result["passes"]),
+        },
+    )
+
+
 @router.post("/generate-latex")
 async def generate_latex_only(data: ResumeData):
     try:
         latex_text = generate_latex(data)
         return {"latex": latex_text}
+    except UnknownTemplate as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"LaTeX generation failed: {str(e)}"
         )
+
+
+@router.post("/generate-latex/stream")
+async def stream_latex(data: ResumeData):
+    try:
+        chunks = iter_latex(data)
+    except UnknownTemplate as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        chunks,
+        media_type="text/x-tex",
+        headers={"Content-Disposition": 'attachment; filename="resume.tex"'},
+    )
+
+
+@router.get("/templates")
+async def get_templates():
+    return list_templates()
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return {**(await get_cache_stats()), "fragments": get_fragment_stats()}
+
+
+@router.get("/scheduler/stats")
+async def scheduler_stats():
+    return get_scheduler_stats()
+
+
+def _queue_full(e: CompileQueueFull) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def _limit_exceeded(e: ResourceLimitExceeded) -> HTTPException:
+    return HTTPException(
+        status_code=422, detail={"message": str(e), "limit": e.resource}
+    )
+
+
+def _compile_failed(
+    e: LatexCompileError, latex_text: str, data: Optional[ResumeData] = None
+) -> HTTPException:
+    source_lines = latex_text.splitlines()
+    errors = []
+    for error in e.errors:
+        error = asdict(error)
+        if data is not None and error["line"] and error["line"] <= len(source_lines):
+            error["field"] = find_field(data, source_lines[error["line"] - 1])
+        errors.append(error)
+
+    return HTTPException(
+        status_code=422,
+        detail={"message": "LaTeX compilation failed", "errors": errors, "log": e.log},
+    )
+
+
+def _compile_job(doc: dict) -> CompileJob:
+    result = doc.get("result") or {}
+    return CompileJob(
+        id=doc["_id"],
+        status=doc["status"],
+        output="preview" if doc["kind"] == "webp" else "pdf",
+        created_at=doc["created_at"],
+        finished_at=doc.get("finished_at"),
+        expires_at=doc.get("expires_at"),
+        document_id=result.get("document_id"),
+        page_count=result.get("page_count"),
+        error=doc.get("error"),
+    )
+
+
+def _cache_status(result: CompileResult) -> str:
+    if result.cached:
+        return "hit"
+    return "coalesced" if result.coalesced else "miss"
+
+
+def _compile_headers(
+    result: CompileResult, timings: Optional[dict[str, float]] = None
+) -> dict[str, str]:
+    headers = {
+        "X-Compile-Passes": str(result.passes),
+        "X-Compile-Cache": _cache_status(result),
+    }
+    timings = {**(timings or {}), **result.timings}
+    if timings:
+        headers["Server-Timing"] = server_timing(timings)
+    return headers
@@ -3,9 +3,11 @@ from typing import List
 from uuid import uuid4
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
-from ..database import get_profiles_collection
+from ..database import get_profiles_collection, get_resumes_collection
 from ..models.profile import Profile, ProfileCreate, ProfileUpdate
+from ..services.profile_export import export_resumes_zip, safe_filename
 
 router = APIRouter()
 
@@ -56,6 +58,26 @@ async def create_profile(profile: ProfileCreate):
     )
 
 
+@router.get("/{profile_id}/export.zip")
+async def export_profile(profile_id: str):
+    collection = get_profiles_collection()
+    profile = await collection.find_one({"_id": profile_id})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    resumes_collection = get_resumes_collection()
+    resumes = await resumes_collection.find(
+        {"profile_id": profile_id}, projection={"title": 1, "data": 1}
+    ).to_list(length=None)
+
+    filename = safe_filename(profile["name"], "resumes")
+    return StreamingResponse(
+        export_resumes_zip(resumes),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.zip"'},
+    )
+
+
 @router.put("/{profile_id}", response_model=Profile)
 async def update_profile(profile_id: str, profile: ProfileUpdate):
     collection = get_profiles_collection()
@@ -85,7 +107,5 @@ async def delete_profile(profile_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Profile not found")
 
-    from ..database import get_resumes_collection
-
     resumes_collection = get_resumes_collection()
     await resumes_collection.delete_many({"profile_id": profile_id})
@@ -1,11 +1,47 @@
-from .escape_latex import escape_latex, escape_url
-from .latex_compiler import compile_latex_to_pdf, compile_latex_to_webp
-from .template_engine import generate_latex
+from .escape_latex import escape_latex, escape_latex_many, escape_url
+from .latex_compiler import (
+    PREVIEW_TIERS,
+    CompileQueueFull,
+    CompileResult,
+    DocumentNotFound,
+    LatexCompileError,
+    TexError,
+    compile_latex_to_pdf,
+    compile_latex_to_pdf_file,
+    compile_latex_to_webp,
+    get_cache_stats,
+    get_scheduler_stats,
+    render_pdf_page,
+)
+from .sandbox import ResourceLimitExceeded
+from .template_engine import (
+    find_field,
+    generate_latex,
+    iter_latex,
+    list_templates,
+    write_latex,
+)
 
 __all__ = [
+    "PREVIEW_TIERS",
     "escape_latex",
+    "escape_latex_many",
     "escape_url",
+    "find_field",
     "generate_latex",
+    "iter_latex",
+    "list_templates",
+    "write_latex",
+    "CompileQueueFull",
+    "CompileResult",
+    "DocumentNotFound",
+    "LatexCompileError",
+    "ResourceLimitExceeded",
+    "TexError",
     "compile_latex_to_pdf",
+    "compile_latex_to_pdf_file",
     "compile_latex_to_webp",
+    "get_cache_stats",
+    "get_scheduler_stats",
+    "render_pdf_page",
 ]
@@ -0,0 +1,262 @@
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Optional
+from uuid import uuid4
+
+KEY_RE = re.compile(r"[0-9a-f]{64}")
+# Pins left behind by a process that died mid-download are removed after this
+PIN_MAX_AGE = 3600
+
+
+class CompileCache:
+    """
+    Content-addressed on-disk cache for compiled artifacts.
+
+    Entries are plain files named after the hash of their inputs, written
+    atomically with os.replace so several uvicorn workers can share one
+    directory. Recency is tracked through the file mtime, which makes the
+    LRU order visible to every process; eviction runs under an flock so
+    only one worker scans the directory at a time. Files being streamed are
+    pinned with a hardlink in .pinned, so eviction cannot pull them away
+    mid-response.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._lock_path = os.path.join(root, ".lock")
+        self._pin_dir = os.path.join(root, ".pinned")
+
+        os.makedirs(self._pin_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(source: str, kind: str, engine: str, dpi: Optional[int] = None) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{kind}\0{engine}\0{dpi or ''}\0".encode("utf-8"))
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not KEY_RE.fullmatch(key):
+            # Keys can come from URLs; never let them address other paths
+            self.count_lookup(hit=False)
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.count_lookup(hit=False)
+            return None
+
+        self.count_lookup(hit=True)
+        return data
+
+    def locate(self, key: str) -> Optional[str]:
+        # Like get, but for callers that stream the file instead of loading it
+        path = self.file_path(key)
+        if path is not None:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                path = None
+
+        self.count_lookup(hit=path is not None)
+        return path
+
+    def pin(self, key: str, count: bool = True) -> Optional[str]:
+        """
+        Hardlink an entry so it outlives eviction while a caller streams it.
+
+        Returns the pinned path, which the caller passes to unpin() when it
+        is done with the file.
+        """
+        path = self.file_path(key)
+        pinned = None
+        if path is not None:
+            pinned = os.path.join(self._pin_dir, f"{key}-{uuid4().hex}")
+            try:
+                os.link(path, pinned)
+                os.utime(path)
+            except FileNotFoundError:
+                pinned = None
+
+        if count:
+            self.count_lookup(hit=pinned is not None)
+        return pinned
+
+    def unpin(self, pinned: str) -> None:
+        try:
+            os.remove(pinned)
+        except FileNotFoundError:
+            pass
+
+    def file_path(self, key: str) -> Optional[str]:
+        if not KEY_RE.fullmatch(key):
+            return None
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+    def contains(self, key: str) -> bool:
+        return self.file_path(key) is not None
+
+    def put(self, key: str, data: bytes) -> None:
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return
+        self._store(key, lambda f: f.write(data))
+
+    def put_file(self, key: str, source_path: str) -> None:
+        if self.max_bytes <= 0 or os.path.getsize(source_path) > self.max_bytes:
+            return
+
+        def copy(f: BinaryIO) -> None:
+            with open(source_path, "rb") as source:
+                shutil.copyfileobj(source, f)
+
+        self._store(key, copy)
+
+    def _store(self, key: str, write: Callable[[BinaryIO], object]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        self._evict()
+
+    def stats(self) -> dict:
+        entries, size = 0, 0
+        for entry in self._entries():
+            entries += 1
+            size += entry[2]
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def count_lookup(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _entries(self) -> list[tuple[str, float, int]]:
+        entries = []
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self) -> None:
+        with open(self._lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker is already trimming the cache
+                return
+
+            try:
+                self._remove_stale_pins()
+                entries = self._entries()
+                total = sum(size for _, _, size in entries)
+                if total <= self.max_bytes:
+                    return
+
+                entries.sort(key=lambda entry: entry[1])
+                for path, _, size in entries:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        continue
+                    total -= size
+                    with self._lock:
+                        self.evictions += 1
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _remove_stale_pins(self) -> None:
+        deadline = time.time() - PIN_MAX_AGE
+        with os.scandir(self._pin_dir) as it:
+            for entry in it:
+                try:
+                    if entry.stat().st_mtime < deadline:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+
+
+class FailureCache:
+    """
+    Short-lived in-memory record of inputs that failed to compile.
+
+    Resubmitting the same broken document returns the remembered error
+    instead of running TeX again. Entries expire after ttl seconds so a
+    failure caused by the environment does not stick around.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self._entries: OrderedDict[str, tuple[float, Exception]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[Exception]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires, error = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self.hits += 1
+        return error
+
+    def put(self, key: str, error: Exception) -> None:
+        if self.ttl <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, error)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "entries": len(self._entries), "ttl": self.ttl}
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Optional
+from uuid import uuid4
+
+from pymongo import ASCENDING, ReturnDocument
+
+from ..config import get_settings
+from ..database import get_compile_jobs_collection
+
+settings = get_settings()
+MAX_ATTEMPTS = 2
+POLL_MIN_SECONDS = 0.05
+POLL_MAX_SECONDS = 0.5
+STALE_CHECK_SECONDS = 30
+
+
+async def ensure_indexes() -> None:
+    collection = get_compile_jobs_collection()
+    await collection.create_index(
+        [("status", ASCENDING), ("lane", ASCENDING), ("created_at", ASCENDING)]
+    )
+    # MongoDB removes jobs, results included, once expires_at has passed
+    await collection.create_index("expires_at", expireAfterSeconds=0)
+
+
+async def enqueue(job: dict, status: str = "queued") -> str:
+    job_id = str(uuid4())
+    now = datetime.now(UTC)
+    await get_compile_jobs_collection().insert_one(
+        {
+            "_id": job_id,
+            **job,
+            "status": status,
+            "attempts": 0,
+            "created_at": now,
+            # Replaced on completion; covers jobs that never finish
+            "expires_at": now
+            + timedelta(
+                seconds=settings.compile_job_timeout + settings.compile_job_ttl
+            ),
+        }
+    )
+    return job_id
+
+
+async def get(job_id: str, with_result: bool = False) -> Optional[dict]:
+    projection = None if with_result else {"latex": 0, "result.data": 0}
+    return await get_compile_jobs_collection().find_one(
+        {"_id": job_id}, projection=projection
+    )
+
+
+async def queued_count() -> int:
+    return await get_compile_jobs_collection().count_documents({"status": "queued"})
+
+
+async def wait(job_id: str, timeout: float) -> dict:
+    collection = get_compile_jobs_collection()
+    deadline = time.monotonic() + timeout
+    interval = POLL_MIN_SECONDS
+
+    while time.monotonic() < deadline:
+        doc = await collection.find_one(
+            {"_id": job_id, "status": {"$in": ["done", "failed"]}}
+        )
+        if doc:
+            await collection.delete_one({"_id": job_id})
+            return doc
+        await asyncio.sleep(interval)
+        interval = min(interval * 2, POLL_MAX_SECONDS)
+
+    # Nobody is waiting for it anymore, so a worker should not pick it up
+    await collection.delete_one({"_id": job_id, "status": "queued"})
+    raise Exception(f"Compile job did not finish within {timeout} seconds")
+
+
+async def claim(worker_id: str) -> Optional[dict]:
+    # Previews (lane 0) are claimed before exports, oldest first within a lane
+    return await get_compile_jobs_collection().find_one_and_update(
+        {"status": "queued"},
+        {
+            "$set": {
+                "status": "running",
+                "worker": worker_id,
+                "started_at": datetime.now(UTC),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("lane", ASCENDING), ("created_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def complete(job_id: str, result: dict) -> None:
+    await _finish(job_id, {"status": "done", "result": result})
+
+
+async def fail(job_id: str, error: dict) -> None:
+    await _finish(job_id, {"status": "failed", "error": error})
+
+
+def stale_after() -> float:
+    """
+    Seconds after which a running job is taken as abandoned.
+
+    Jobs are cancelled after COMPILE_JOB_TIMEOUT; the extra check interval
+    lets a job that just timed out record its failure first.
+    """
+    return settings.compile_job_timeout + STALE_CHECK_SECONDS
+
+
+async def requeue_stale(timeout: float) -> int:
+    """
+    Hand jobs of workers that died mid-compile to another worker.
+
+    A job that already took down MAX_ATTEMPTS workers is failed instead,
+    so one poisonous document cannot crash the whole pool in turn.
+    """
+    collection = get_compile_jobs_collection()
+    now = datetime.now(UTC)
+    stale = {
+        "status": "running",
+        "started_at": {"$lt": now - timedelta(seconds=timeout)},
+    }
+
+    await _fail_many(
+        {**stale, "attempts": {"$gte": MAX_ATTEMPTS}}, "Compile worker stopped"
+    )
+    result = await collection.update_many(
+        stale,
+        {"$set": {"status": "queued"}, "$unset": {"worker": "", "started_at": ""}},
+    )
+    return result.modified_count
+
+
+async def fail_stale(timeout: float) -> int:
+    """
+    Fail jobs left running by an API process that stopped mid-compile.
+
+    Without compile workers, detached jobs run inside the API process that
+    accepted them, and nothing picks them up again once it is gone. Jobs
+    are cancelled after the compile timeout, so one still running after
+    stale_after() can only belong to such a process.
+    """
+    now = datetime.now(UTC)
+    return await _fail_many(
+        {
+            "status": "running",
+            "created_at": {"$lt": now - timedelta(seconds=timeout)},
+        },
+        "Compile was interrupted by an API restart",
+    )
+
+
+async def _fail_many(query: dict, message: str) -> int:
+    now = datetime.now(UTC)
+    result = await get_compile_jobs_collection().update_many(
+        query,
+        {
+            "$set": {
+                "status": "failed",
+                "finished_at": now,
+                "expires_at": now + timedelta(seconds=settings.compile_job_ttl),
+                "error": {"type": "Exception", "message": message},
+            }
+        },
+    )
+    return result.modified_count
+
+
+async def _finish(job_id: str, fields: dict) -> None:
+    now = datetime.now(UTC)
+    await get_compile_jobs_collection().update_one(
+        {"_id": job_id, "status": "running"},
+        {
+            "$set": {
+                **fields,
+                "finished_at": now,
+                "expires_at": now + timedelta(seconds=settings.compile_job_ttl),
+            }
+        },
+    )
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+SESSION_PREFIX = "session-"
+
+
+@dataclass
+class CompileSession:
+    """Compile state kept between previews of one open resume."""
+
+    work_dir: Optional[str] = None
+    # Engine and format that produced the last PDF, tried first next time
+    attempt: Optional[tuple[str, Optional[str]]] = None
+    # Document whose PDF is currently in work_dir
+    pdf_key: Optional[str] = None
+    page_count: int = 0
+    compiles: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class CompileSessions:
+    """
+    Compile sessions keyed by resume id.
+
+    A session keeps its work directory, with the .aux and .log of the last
+    run, so the next preview of the same resume starts from warm state.
+    Sessions idle for longer than ttl seconds, or the least recently used
+    ones beyond max_sessions, are dropped by expire(). Only used from the
+    event loop.
+    """
+
+    def __init__(self, ttl: int, max_sessions: int):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: dict[str, CompileSession] = {}
+        self.reused = 0
+        self.expired = 0
+
+    def get(self, session_id: str) -> CompileSession:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = CompileSession()
+        else:
+            self.reused += 1
+        session.last_used = time.monotonic()
+        return session
+
+    def expire(self) -> list[str]:
+        """Drop idle sessions and return the work directories to remove."""
+        deadline = time.monotonic() - self.ttl
+        idle = sorted(
+            (
+                (session.last_used, session_id)
+                for session_id, session in self._sessions.items()
+                if not session.lock.locked()
+            ),
+        )
+        over = len(self._sessions) - self.max_sessions
+
+        removed = []
+        for last_used, session_id in idle:
+            if last_used >= deadline and over <= 0:
+                break
+            session = self._sessions.pop(session_id)
+            over -= 1
+            self.expired += 1
+            if session.work_dir is not None:
+                removed.append(session.work_dir)
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._sessions),
+            "reused": self.reused,
+            "expired": self.expired,
+        }
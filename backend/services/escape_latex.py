@@ -4,14 +4,67 @@ Ported from TypeScript: src/lib/utils.ts
 """
 
 import re
-from typing import List
-
-
+from functools import lru_cache
+from typing import Iterable, List
+
+ESCAPE_CACHE_SIZE = 8192
+
+# Special characters and what they become. A backslash turns into
+# \textbackslash\{\} with its own braces escaped, so no user text can ever
+# form a control sequence (\write, \input, \begin{verbatim}, \def, ...).
+# A double quote becomes four single quotes: the old chained replace()
+# calls turned it into '' and then doubled each of those.
+ESCAPES = {
+    "\\": "\\textbackslash\\{\\}",
+    "_": "\\_",
+    "{": "\\{",
+    "}": "\\}",
+    "$": "\\$",
+    "%": "\\%",
+    "#": "\\#",
+    "&": "\\&",
+    "^": "\\^{}",
+    "~": "\\textasciitilde{}",
+    "`": "\\textasciigrave{}",
+    '"': "''''",
+    "'": "''",
+}
+
+# A percent sign followed by a character that escapes to a command word
+# (\textbackslash, \textasciitilde, \textasciigrave) has that word blocked,
+# and the whitespace in between collapses to a single space
+BLOCKED_AFTER_PERCENT = {
+    "\\": "\\% [BLOCKED:\\textbackslash]\\{\\}",
+    "~": "\\% [BLOCKED:\\textasciitilde]{}",
+    "`": "\\% [BLOCKED:\\textasciigrave]{}",
+}
+
+ESCAPE_RE = re.compile(
+    r"%\s*([\\~`])|[" + re.escape("".join(ESCAPES)) + "]",
+)
+
+# Joins texts for escape_latex_many. It is neither special nor whitespace,
+# so the percent rule can never reach across two texts.
+BATCH_SEPARATOR = "\x00"
+
+
+def _replace(match: re.Match) -> str:
+    blocked = match.group(1)
+    if blocked is not None:
+        return BLOCKED_AFTER_PERCENT[blocked]
+    return ESCAPES[match.group()]
+
+
+@lru_cache(maxsize=ESCAPE_CACHE_SIZE)
 def escape_latex(text: str) -> str:
     """
     Escape special LaTeX characters and block dangerous commands.
     This is critical for security when accepting user input.
 
+    The text is scanned once with a precompiled pattern, and results are
+    memoized since the same dates, titles and bullets recur across
+    previews.
+
     Args:
         text: Raw text to escape
 
@@ -21,106 +74,21 @@ def escape_latex(text: str) -> str:
     if not text:
         return ""
 
-    # Order matters! Backslash must be first
-    escaped = text
-
-    # Escape special characters
-    escaped = escaped.replace("\\", "\\textbackslash{}")  # Backslash
-    escaped = escaped.replace("_", "\\_")  # Underscore
-    escaped = escaped.replace("{", "\\{")  # Left brace
-    escaped = escaped.replace("}", "\\}")  # Right brace
-    escaped = escaped.replace("$", "\\$")  # Dollar sign
-    escaped = escaped.replace("%", "\\%")  # Percent sign
-    escaped = escaped.replace("#", "\\#")  # Hash
-    escaped = escaped.replace("&", "\\&")  # Ampersand
-    escaped = escaped.replace("^", "\\^{}")  # Caret (superscript)
-    escaped = escaped.replace("~", "\\textasciitilde{}")  # Tilde
-    escaped = escaped.replace("`", "\\textasciigrave{}")  # Backtick
-    escaped = escaped.replace('"', "''")  # Double quote
-    escaped = escaped.replace("'", "''")  # Single quote
-
-    # List of dangerous commands to block
-    dangerous_commands: List[str] = [
-        "write",
-        "read",
-        "openin",
-        "openout",
-        "input",
-        "include",
-        "import",
-        "usepackage",
-        "documentclass",
-        "lstinputlisting",
-        "verbatiminput",
-        "immediate",
-        "newcommand",
-        "renewcommand",
-        "def",
-        "let",
-        "futurelet",
-        "catcode",
-        "makeatletter",
-        "csname",
-        "endcsname",
-        "message",
-        "special",
-        "shell",
-        "ShellEscape",
-        "write18",
-        "PassOptionsToPackage",
-        "afterassignment",
-        "expandafter",
-    ]
-
-    # Block dangerous commands that might have been escaped
-    for command in dangerous_commands:
-        # Match the escaped backslash followed by command name
-        pattern = rf"\\textbackslash\{{\}}\s*({re.escape(command)})"
-        escaped = re.sub(pattern, r"[BLOCKED:\1]", escaped, flags=re.IGNORECASE)
-
-    # Block verbatim environments which could bypass escaping
-    verbatim_pattern = r"\\begin\s*\{\s*(verbatim|lstlisting|minted|alltt)\s*\}"
-    escaped = re.sub(
-        verbatim_pattern, "[BLOCKED:VERBATIM]", escaped, flags=re.IGNORECASE
-    )
-
-    # Block potentially dangerous math environments
-    math_environments = ["equation", "align", "displaymath", "math", "eqnarray"]
-    for env in math_environments:
-        pattern = rf"\\begin\s*\{{\s*{env}\s*\}}"
-        escaped = re.sub(pattern, f"[SANITIZED:{env}]", escaped, flags=re.IGNORECASE)
-
-    # Block attempts to use comments for injection
-    escaped = re.sub(r"\\%\s*(\\[a-zA-Z]+)", r"\\% [BLOCKED:\1]", escaped)
-
-    # Block attempts to create new commands
-    escaped = re.sub(
-        r"\\textbackslash\{\}(new|renew|provide)[a-zA-Z]*",
-        "[BLOCKED:COMMAND-DEFINITION]",
-        escaped,
-        flags=re.IGNORECASE,
-    )
-
-    # Block TeX primitives that could be used for injection
-    tex_primitives = [
-        "atop",
-        "above",
-        "over",
-        "mathchoice",
-        "discretionary",
-        "loop",
-        "repeat",
-        "unless",
-        "ifx",
-        "ifnum",
-    ]
-    for primitive in tex_primitives:
-        pattern = rf"\\textbackslash\{{\}}{primitive}"
-        escaped = re.sub(
-            pattern, f"[BLOCKED:{primitive}]", escaped, flags=re.IGNORECASE
-        )
+    return ESCAPE_RE.sub(_replace, text)
 
-    return escaped
+
+def escape_latex_many(texts: Iterable[str]) -> List[str]:
+    """
+    Escape a list of texts, such as the bullets of an entry, in one pass.
+
+    Gives the same result as calling escape_latex on each text.
+    """
+    texts = [text or "" for text in texts]
+    joined = BATCH_SEPARATOR.join(texts)
+    if len(texts) < 2 or joined.count(BATCH_SEPARATOR) != len(texts) - 1:
+        return [escape_latex(text) for text in texts]
+
+    return ESCAPE_RE.sub(_replace, joined).split(BATCH_SEPARATOR)
 
 
 def escape_url(url: str) -> str:
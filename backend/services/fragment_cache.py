@@ -0,0 +1,68 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, TypeVar
+
+from pydantic import BaseModel
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class FragmentCache:
+    """
+    LRU memo of rendered LaTeX fragments keyed by the model they came from.
+
+    The key is a hash of the model's JSON plus the render function and its
+    extra arguments (the template), so an unchanged entry or section is
+    reused across previews and resumes while any edit to it produces a new
+    key.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, str] = OrderedDict()
+        self._counts: dict[str, list[int]] = {}
+        self._lock = threading.Lock()
+
+    def render(self, model: M, render: Callable[..., str], *args: Any) -> str:
+        if self.max_entries <= 0:
+            return render(model, *args)
+
+        kind = type(model).__name__
+        digest = hashlib.blake2b(
+            model.model_dump_json().encode("utf-8"), digest_size=16
+        ).digest()
+        key = (render.__name__, *args, digest)
+
+        with self._lock:
+            latex = self._entries.get(key)
+            if latex is not None:
+                self._entries.move_to_end(key)
+            self._count(kind, hit=latex is not None)
+        if latex is not None:
+            return latex
+
+        latex = render(model, *args)
+        with self._lock:
+            self._entries[key] = latex
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return latex
+
+    def stats(self) -> dict:
+        with self._lock:
+            kinds = {
+                kind: {"hits": hits, "misses": misses}
+                for kind, (hits, misses) in sorted(self._counts.items())
+            }
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": sum(counts["hits"] for counts in kinds.values()),
+                "misses": sum(counts["misses"] for counts in kinds.values()),
+                "kinds": kinds,
+            }
+
+    def _count(self, kind: str, hit: bool) -> None:
+        counts = self._counts.setdefault(kind, [0, 0])
+        counts[0 if hit else 1] += 1
@@ -1,132 +1,1344 @@
 import asyncio
+import heapq
+import io
+import itertools
+import math
 import os
+import re
 import shutil
 import subprocess
 import tempfile
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import asdict, dataclass, field, replace
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
 
 from PIL import Image
 
 from ..config import get_settings
+from . import compile_queue
+from .compile_cache import CompileCache, FailureCache
+from .compile_session import SESSION_PREFIX, CompileSession, CompileSessions
+from .metrics import stage_seconds, timed
+from .sandbox import (
+    LIMIT_ERRORS,
+    ResourceLimitExceeded,
+    breaches,
+    check_limits,
+    create_limited_subprocess,
+)
+from .single_flight import SingleFlight
+from .tex_format import discard_format, find_format, format_env
+from .workdir_pool import WorkDirPool, resolve_root
 
 settings = get_settings()
 TEMP_DIR = settings.temp_dir
 TIMEOUT = settings.latex_timeout
+ENGINES = ("pdflatex", "xelatex")
+ENGINE_KEY = "+".join(ENGINES)
+MAX_PASSES = settings.latex_max_passes
 
-os.makedirs(TEMP_DIR, exist_ok=True)
+# Documents using any of these need at least two passes to settle
+MULTI_PASS_RE = re.compile(
+    r"\\(?:(?:page|eq|auto|c|C|name)?ref|label|cite[a-z]*|tableofcontents"
+    r"|listoffigures|listoftables)\b|\\usepackage\{lastpage\}"
+)
+RERUN_RE = re.compile(r"Rerun to get|Rerun LaTeX|Label\(s\) may have changed")
+OUTPUT_PAGES_RE = re.compile(r"Output written on .*?\((\d+) pages?[,)]")
+# Only these .aux lines are read back in a way that changes the output
+AUX_REFERENCE_PREFIXES = ("\\newlabel", "\\bibcite", "\\@writefile", "\\zref@newlabel")
+TEX_ERROR_LINE_RE = re.compile(r"l\.(\d+) ?(.*)")
+FATAL_ERROR_RE = re.compile(r"Fatal error occurred|Emergency stop|job aborted")
+# The only failures where retrying with xelatex can produce a different result
+ENCODING_ERROR_RE = re.compile(
+    r"inputenc|fontenc|Unicode char|UTF-?8|Invalid character|Missing character",
+    re.IGNORECASE,
+)
+MAX_REPORTED_ERRORS = 10
 
+PREVIEW_TIERS = {
+    "low": settings.preview_low_dpi,
+    "high": settings.preview_high_dpi,
+}
+WORK_DIR_ROOT = resolve_root(settings.work_dir_root, TEMP_DIR)
+# With the queue backend compiles run in backend.worker processes instead
+QUEUE_BACKEND = settings.compile_backend == "queue"
+# Downloads are linearized and recompressed when qpdf is available
+PDF_OPTIMIZE = settings.pdf_optimize and shutil.which("qpdf") is not None
 
-async def compile_latex_to_webp(latex_text: str, dpi: int = 150) -> bytes:
-    work_dir = tempfile.mkdtemp(dir=TEMP_DIR)
+T = TypeVar("T")
 
+
+@dataclass
+class CompileResult:
+    data: bytes
+    passes: int = 0
+    cached: bool = False
+    timings: dict[str, float] = field(default_factory=dict)
+    document_id: Optional[str] = None
+    page_count: int = 0
+    coalesced: bool = False
+    # Set instead of data when the artifact should be streamed from disk
+    path: Optional[str] = None
+    release: Optional[Callable[[], Awaitable[None]]] = None
+
+
+@dataclass
+class TexError:
+    message: str
+    line: Optional[int] = None
+    context: str = ""
+    field: Optional[str] = None
+
+
+class DocumentNotFound(Exception):
+    pass
+
+
+class LatexCompileError(Exception):
+    def __init__(self, errors: list[TexError], log: str, output: str = ""):
+        summary = "; ".join(
+            f"{error.message} (line {error.line})" if error.line else error.message
+            for error in errors[:3]
+        )
+        super().__init__(
+            f"PDF compilation failed: {summary or 'no output produced'}"
+            f"\nError: {output}\nLog:\n{log}"
+        )
+        self.errors = errors
+        self.log = log
+
+
+class CompileQueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Compile queue is full, try again later")
+        self.retry_after = retry_after
+
+
+class CompileScheduler:
+    """
+    Limits how many compiles run at once and queues the rest.
+
+    Waiting jobs are served by lane, lowest first, then in arrival order, so
+    interactive previews overtake queued PDF exports. Once max_queue jobs
+    are waiting, new ones are rejected with CompileQueueFull instead of
+    piling up until they time out.
+    """
+
+    PREVIEW = 0
+    EXPORT = 1
+
+    def __init__(self, max_jobs: int, max_queue: int):
+        self.max_jobs = max(1, max_jobs)
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._average_seconds = 1.0
+
+    @asynccontextmanager
+    async def slot(self, lane: int) -> AsyncIterator[None]:
+        await self._acquire(lane)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._average_seconds = 0.8 * self._average_seconds + 0.2 * elapsed
+            self.completed += 1
+            self._release()
+
+    def retry_after(self) -> int:
+        backlog = (self.waiting + 1) / self.max_jobs
+        return max(1, math.ceil(backlog * self._average_seconds))
+
+    def stats(self) -> dict:
+        return {
+            "max_jobs": self.max_jobs,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "average_seconds": round(self._average_seconds, 3),
+        }
+
+    async def _acquire(self, lane: int) -> None:
+        if self.active < self.max_jobs and not self.waiting:
+            self.active += 1
+            return
+
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise CompileQueueFull(self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane, next(self._sequence), future))
+        self.waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self.waiting -= 1
+            else:
+                # The slot was handed over just before the cancellation
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                self.waiting -= 1
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+cache: Optional[CompileCache] = (
+    CompileCache(settings.cache_dir, settings.cache_max_bytes)
+    if settings.cache_enabled
+    else None
+)
+failures = FailureCache(settings.compile_failure_ttl)
+scheduler = CompileScheduler(settings.compile_max_jobs, settings.compile_max_queue)
+flights = SingleFlight()
+# Keeps background jobs referenced until they finish
+detached_jobs: set[asyncio.Task] = set()
+work_dirs = WorkDirPool(WORK_DIR_ROOT, settings.compile_max_jobs)
+sessions = CompileSessions(settings.compile_session_ttl, settings.compile_session_max)
+# File and cache I/O and image encoding must never run on the event loop
+io_executor = ThreadPoolExecutor(settings.io_workers, thread_name_prefix="compile-io")
+image_executor = ThreadPoolExecutor(
+    settings.image_workers, thread_name_prefix="compile-image"
+)
+
+
+async def compile_latex_to_webp(
+    latex_text: str,
+    dpi: int = PREVIEW_TIERS["high"],
+    lane: int = CompileScheduler.PREVIEW,
+    session_id: Optional[str] = None,
+) -> CompileResult:
+    """
+    Compile and render the first page as WebP.
+
+    Previews passing a session_id (the id of the resume being edited)
+    compile in that resume's session directory and reuse the .aux, log
+    and engine choice of its previous preview. Queued compiles run on
+    other processes and ignore it.
+    """
+    if QUEUE_BACKEND:
+        job = {"kind": "webp", "latex": latex_text, "dpi": dpi, "lane": lane}
+        return await _run_queued(job, _cache_key(latex_text, "pdf"))
+    return await _local_webp(latex_text, dpi, lane, session_id)
+
+
+async def compile_latex_to_pdf(
+    latex_text: str, lane: int = CompileScheduler.EXPORT
+) -> CompileResult:
+    if QUEUE_BACKEND:
+        job = {"kind": "pdf", "latex": latex_text, "lane": lane}
+        return await _run_queued(job, _cache_key(latex_text, "pdf"))
+    return await _local_pdf(latex_text, lane)
+
+
+async def compile_latex_to_pdf_file(
+    latex_text: str, lane: int = CompileScheduler.EXPORT
+) -> CompileResult:
+    """
+    Compile to a PDF on disk so it can be streamed instead of loaded.
+
+    result.path is a pinned link to the cached PDF or, with the cache
+    disabled, the PDF in a reserved work directory. Either way it stays in
+    place until result.release() is awaited, even if the cache evicts it.
+    With the queue backend the workers leave the PDF in the shared
+    CACHE_DIR and it is pinned from there. If this process does not share
+    that directory, result.data is filled in and path is None.
+    """
+    if QUEUE_BACKEND:
+        return await _queued_pdf_file(latex_text, lane)
+    return await _local_pdf_file(latex_text, lane)
+
+
+async def render_pdf_page(
+    document_id: str,
+    page: int,
+    dpi: int = PREVIEW_TIERS["high"],
+    lane: int = CompileScheduler.PREVIEW,
+) -> CompileResult:
+    if QUEUE_BACKEND:
+        job = {
+            "kind": "page",
+            "document_id": document_id,
+            "page": page,
+            "dpi": dpi,
+            "lane": lane,
+        }
+        return await _run_queued(job, document_id)
+    return await _local_page(document_id, page, dpi, lane)
+
+
+async def run_job(job: dict) -> CompileResult:
+    # Called by the compile worker for jobs taken from the queue
+    if job["kind"] == "webp":
+        return await _local_webp(job["latex"], job["dpi"], job["lane"])
+    if job["kind"] == "pdf":
+        return await _local_pdf(job["latex"], job["lane"])
+    if job["kind"] == "pdf_file":
+        return await _shared_pdf_file(job["latex"], job["lane"])
+    if job["kind"] == "page":
+        return await _local_page(
+            job["document_id"], job["page"], job["dpi"], job["lane"]
+        )
+    raise Exception(f"Unknown compile job kind: {job['kind']}")
+
+
+async def finish_job(job_id: str, job: dict) -> None:
+    """
+    Run a queued or detached job and store its result or error.
+
+    The job is cancelled after COMPILE_JOB_TIMEOUT, which kills its TeX or
+    Ghostscript process. A job still marked running after that can only
+    belong to a process that stopped, so requeue_stale and fail_stale never
+    take one away from a live worker.
+    """
     try:
-        pdf_path = await _compile_to_pdf(latex_text, work_dir)
-        webp_path = os.path.join(work_dir, "resume.webp")
-        await _pdf_to_webp(pdf_path, webp_path, dpi)
+        result = await asyncio.wait_for(run_job(job), settings.compile_job_timeout)
+    except asyncio.TimeoutError:
+        error = Exception(
+            f"Compile job did not finish within {settings.compile_job_timeout} seconds"
+        )
+        await compile_queue.fail(job_id, error_to_job(error))
+    except Exception as e:
+        await compile_queue.fail(job_id, error_to_job(e))
+    else:
+        await compile_queue.complete(job_id, result_to_job(result))
+
+
+async def submit_compile_job(latex_text: str, kind: str = "pdf") -> str:
+    """
+    Start a compile without waiting for it and return the job id.
+
+    The job and its result live in the compile_jobs collection until
+    COMPILE_JOB_TTL after it finishes. With the local backend the job runs
+    as a background task of this process.
+    """
+    job = {"kind": kind, "latex": latex_text}
+    if kind == "webp":
+        job.update(dpi=PREVIEW_TIERS["high"], lane=CompileScheduler.PREVIEW)
+    else:
+        job.update(lane=CompileScheduler.EXPORT)
+
+    if QUEUE_BACKEND:
+        await _check_queue_length()
+        return await compile_queue.enqueue(job)
+
+    # Refuse up front like the queue backend, rather than accepting a job
+    # that fails later with CompileQueueFull. Jobs accepted in a burst may
+    # not have reached the scheduler yet, so running jobs are capped too.
+    if (
+        scheduler.waiting >= scheduler.max_queue
+        or len(detached_jobs) >= scheduler.max_jobs + scheduler.max_queue
+    ):
+        scheduler.rejected += 1
+        raise CompileQueueFull(scheduler.retry_after())
+
+    job_id = await compile_queue.enqueue(job, status="running")
+    task = asyncio.create_task(finish_job(job_id, job))
+    detached_jobs.add(task)
+    task.add_done_callback(detached_jobs.discard)
+    return job_id
+
+
+def result_to_job(result: CompileResult) -> dict:
+    return {
+        "data": result.data,
+        "passes": result.passes,
+        "cached": result.cached,
+        "timings": result.timings,
+        "document_id": result.document_id,
+        "page_count": result.page_count,
+    }
 
-        with open(webp_path, "rb") as f:
-            return f.read()
+
+def error_to_job(error: Exception) -> dict:
+    if isinstance(error, LatexCompileError):
+        return {
+            "type": "LatexCompileError",
+            "errors": [asdict(tex_error) for tex_error in error.errors],
+            "log": error.log,
+        }
+    if isinstance(error, DocumentNotFound):
+        return {"type": "DocumentNotFound", "message": str(error)}
+    if isinstance(error, ResourceLimitExceeded):
+        return {
+            "type": "ResourceLimitExceeded",
+            "resource": error.resource,
+            "program": error.program,
+        }
+    if isinstance(error, CompileQueueFull):
+        return {"type": "CompileQueueFull", "retry_after": error.retry_after}
+    return {"type": "Exception", "message": str(error)}
+
+
+def error_from_job(error: dict) -> Exception:
+    if error["type"] == "LatexCompileError":
+        tex_errors = [TexError(**tex_error) for tex_error in error["errors"]]
+        return LatexCompileError(tex_errors, error["log"])
+    if error["type"] == "DocumentNotFound":
+        return DocumentNotFound(error["message"])
+    if error["type"] == "ResourceLimitExceeded":
+        return LIMIT_ERRORS[error["resource"]](error["program"])
+    if error["type"] == "CompileQueueFull":
+        return CompileQueueFull(error["retry_after"])
+    return Exception(error["message"])
+
+
+async def _local_webp(
+    latex_text: str, dpi: int, lane: int, session_id: Optional[str] = None
+) -> CompileResult:
+    pdf_key = _cache_key(latex_text, "pdf")
+    page_count = await _cached_page_count(pdf_key)
+    if page_count:
+        cached = await _cached_page(pdf_key, 1, dpi)
+        if cached is not None:
+            return CompileResult(
+                cached, cached=True, document_id=pdf_key, page_count=page_count
+            )
+
+    _raise_known_failure(pdf_key)
+    return await _single_flight(
+        f"webp:{pdf_key}:{dpi}",
+        lambda: _compile_webp(latex_text, pdf_key, dpi, lane, session_id),
+    )
+
+
+async def _compile_webp(
+    latex_text: str,
+    pdf_key: str,
+    dpi: int,
+    lane: int,
+    session_id: Optional[str] = None,
+) -> CompileResult:
+    async with _session_or_work_dir(session_id, lane) as (work_dir, session):
+        timings: dict[str, float] = {}
+        pdf_path, passes, page_count = await _ensure_pdf(
+            latex_text, pdf_key, work_dir, timings, session
+        )
+
+        webp_bytes = await _render_page(pdf_path, pdf_key, 1, dpi, timings)
+
+        return CompileResult(
+            webp_bytes,
+            passes=passes,
+            timings=timings,
+            document_id=pdf_key,
+            page_count=page_count,
+        )
+
+
+async def _local_pdf(latex_text: str, lane: int) -> CompileResult:
+    result = await _local_pdf_file(latex_text, lane)
+    if result.path is None:
+        return result
+
+    try:
+        pdf_bytes = await _run_io(_read_bytes, result.path)
     finally:
-        shutil.rmtree(work_dir, ignore_errors=True)
+        if result.release is not None:
+            await result.release()
+    return replace(result, data=pdf_bytes, path=None, release=None)
 
 
-async def compile_latex_to_pdf(latex_text: str) -> bytes:
-    work_dir = tempfile.mkdtemp(dir=TEMP_DIR)
+async def _local_pdf_file(latex_text: str, lane: int) -> CompileResult:
+    pdf_key = _cache_key(latex_text, "pdf")
+    # A PDF cached by a preview still needs optimizing, which _compile_pdf
+    # does without running TeX again
+    pinned = await _cache_pin(_served_key(pdf_key))
+    if pinned is not None:
+        result = CompileResult(
+            b"",
+            cached=True,
+            document_id=pdf_key,
+            page_count=await _cached_page_count(pdf_key),
+        )
+        return _pinned_result(result, pinned)
+
+    _raise_known_failure(pdf_key)
+    if cache is None:
+        return await _compile_pdf_held(latex_text, pdf_key, lane)
+
+    for _ in range(2):
+        result = await _single_flight(
+            f"pdf:{pdf_key}", lambda: _compile_pdf(latex_text, pdf_key, lane)
+        )
+        if result.path is None:
+            return result
+        # The result may be shared with other requests, so each one pins its
+        # own link to the cached file
+        pinned = await _cache_pin(os.path.basename(result.path), count=False)
+        if pinned is not None:
+            return _pinned_result(result, pinned)
+    raise Exception("Compiled PDF was evicted before it could be served")
+
+
+async def _compile_pdf(latex_text: str, pdf_key: str, lane: int) -> CompileResult:
+    async with scheduler.slot(lane):
+        async with _work_dir() as work_dir:
+            timings: dict[str, float] = {}
+            pdf_path, passes, page_count = await _ensure_pdf(
+                latex_text, pdf_key, work_dir, timings
+            )
+
+            web_path = await _optimize_pdf(pdf_path, pdf_key, work_dir, timings)
+
+            result = CompileResult(
+                b"",
+                passes=passes,
+                timings=timings,
+                document_id=pdf_key,
+                page_count=page_count,
+            )
+            # Callers stream the cached copy; only PDFs too big to cache are read
+            serve_key = _web_key(pdf_key) if web_path else pdf_key
+            cached_path = cache.file_path(serve_key) if cache is not None else None
+            if cached_path is not None:
+                return replace(result, path=cached_path)
+            return replace(
+                result, data=await _run_io(_read_bytes, web_path or pdf_path)
+            )
+
+
+async def _compile_pdf_held(latex_text: str, pdf_key: str, lane: int) -> CompileResult:
+    # Without a cache the work directory holds the only copy, so it is kept
+    # until the caller has streamed the file and calls release()
+    stack = AsyncExitStack()
+    work_dir = await stack.enter_async_context(_work_dir())
+    try:
+        async with scheduler.slot(lane):
+            timings: dict[str, float] = {}
+            pdf_path, passes, page_count = await _ensure_pdf(
+                latex_text, pdf_key, work_dir, timings
+            )
+            web_path = await _optimize_pdf(pdf_path, pdf_key, work_dir, timings)
+    except BaseException:
+        await stack.aclose()
+        raise
+
+    return CompileResult(
+        b"",
+        passes=passes,
+        timings=timings,
+        document_id=pdf_key,
+        page_count=page_count,
+        path=web_path or pdf_path,
+        release=stack.aclose,
+    )
+
+
+async def _optimize_pdf(
+    pdf_path: str, pdf_key: str, work_dir: str, timings: dict[str, float]
+) -> Optional[str]:
+    # The raw PDF stays the source for page renders; downloads get this copy
+    if not PDF_OPTIMIZE or _cache_has(_web_failed_key(pdf_key)):
+        return None
+
+    web_path = os.path.join(work_dir, "resume-web.pdf")
+    with timed(timings, "optimize"):
+        if not await _linearize(pdf_path, web_path):
+            # Remembered so a PDF qpdf rejects is not retried on every download
+            await _cache_put(_web_failed_key(pdf_key), b"1")
+            return None
+    if cache is not None:
+        await _run_io(cache.put_file, _web_key(pdf_key), web_path)
+    return web_path
 
+
+async def _linearize(pdf_path: str, output_path: str) -> bool:
     try:
-        pdf_path = await _compile_to_pdf(latex_text, work_dir)
+        process = await create_limited_subprocess(
+            "qpdf",
+            "--linearize",
+            "--object-streams=generate",
+            "--compress-streams=y",
+            "--recompress-flate",
+            pdf_path,
+            output_path,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await _communicate(process, 30)
+    except asyncio.TimeoutError:
+        print("PDF optimization timed out, serving the PDF as compiled")
+        return False
+    except FileNotFoundError:
+        return False
+
+    # Exit status 3 means qpdf succeeded with warnings
+    if process.returncode not in (0, 3):
+        error = stderr.decode("utf-8", errors="ignore").strip()
+        print(f"PDF optimization failed, serving the PDF as compiled: {error}")
+        return False
+    return True
+
+
+async def _local_page(
+    document_id: str, page: int, dpi: int, lane: int
+) -> CompileResult:
+    page_count = await _cached_page_count(document_id)
+    if page_count and not 1 <= page <= page_count:
+        raise DocumentNotFound(f"Page {page} does not exist")
+
+    cached = await _cached_page(document_id, page, dpi)
+    if cached is not None:
+        return CompileResult(
+            cached, cached=True, document_id=document_id, page_count=page_count
+        )
+
+    if await _cache_locate(document_id) is None:
+        raise DocumentNotFound("Document is no longer cached, compile it again")
+
+    return await _single_flight(
+        f"page:{document_id}:{page}:{dpi}",
+        lambda: _render_cached_pdf(document_id, page, page_count, dpi, lane),
+    )
+
+
+async def _render_cached_pdf(
+    document_id: str, page: int, page_count: int, dpi: int, lane: int
+) -> CompileResult:
+    async with scheduler.slot(lane):
+        async with _work_dir() as work_dir:
+            timings: dict[str, float] = {}
+            pdf_path = os.path.join(work_dir, "resume.pdf")
+            if not await _cache_copy(document_id, pdf_path):
+                raise DocumentNotFound("Document is no longer cached, compile it again")
+
+            if not page_count:
+                page_count = await _count_pdf_pages(pdf_path)
+                await _cache_put(_page_count_key(document_id), str(page_count).encode())
+                if not 1 <= page <= page_count:
+                    raise DocumentNotFound(f"Page {page} does not exist")
+
+            webp_bytes = await _render_page(pdf_path, document_id, page, dpi, timings)
+
+            return CompileResult(
+                webp_bytes,
+                timings=timings,
+                document_id=document_id,
+                page_count=page_count,
+            )
+
+
+async def warm_up_toolchain(latex_text: str) -> dict[str, float]:
+    """
+    Compile and rasterize a document once, bypassing every cache.
+
+    This loads the format, font maps, kpathsea databases and Ghostscript
+    init files, so the first real compile does not pay for them.
+    """
+    timings: dict[str, float] = {}
+    async with _work_dir() as work_dir:
+        pdf_path, _ = await _compile_to_pdf(latex_text, work_dir, timings)
+        await _pdf_to_webp(pdf_path, [PREVIEW_TIERS["low"]], timings)
+    return timings
+
+
+def get_scheduler_stats() -> dict:
+    return {
+        **scheduler.stats(),
+        "single_flight": flights.stats(),
+        "sessions": sessions.stats(),
+        "limit_breaches": dict(breaches),
+    }
+
+
+async def get_cache_stats() -> dict:
+    if cache is None:
+        return {"enabled": False, "failures": failures.stats()}
+    # Sizing the cache scans its whole directory, often a shared volume
+    stats = await _run_io(cache.stats)
+    return {"enabled": True, **stats, "failures": failures.stats()}
+
+
+async def _run_queued(job: dict, source_key: str) -> CompileResult:
+    key = f"queued:{job['kind']}:{source_key}:{job.get('page', 1)}:{job.get('dpi')}"
+    return await _single_flight(key, lambda: _wait_for_job(job))
+
+
+async def _wait_for_job(job: dict) -> CompileResult:
+    await _check_queue_length()
+    job_id = await compile_queue.enqueue(job)
+    doc = await compile_queue.wait(job_id, settings.compile_job_timeout)
+    if doc["status"] == "failed":
+        error = error_from_job(doc["error"])
+        if isinstance(error, ResourceLimitExceeded):
+            breaches[error.resource] += 1
+        raise error
+
+    result = doc["result"]
+    _record_job_result(result)
+    return CompileResult(
+        result["data"],
+        passes=result["passes"],
+        cached=result["cached"],
+        timings=result["timings"],
+        document_id=result["document_id"],
+        page_count=result["page_count"],
+    )
+
+
+def _record_job_result(result: dict) -> None:
+    # Workers have no /metrics of their own, so what they measured is
+    # counted here, in the API process that waited for the job
+    for stage, seconds in result["timings"].items():
+        stage_seconds.observe(stage, seconds)
+    scheduler.completed += 1
+    if cache is not None:
+        cache.count_lookup(hit=result["cached"])
+
+
+async def _queued_pdf_file(latex_text: str, lane: int) -> CompileResult:
+    pdf_key = _cache_key(latex_text, "pdf")
+    # As in _local_pdf_file, a PDF cached unoptimized by a preview is left to
+    # the worker to optimize
+    pinned = await _cache_pin(_served_key(pdf_key), count=False)
+    if pinned is not None:
+        cache.count_lookup(hit=True)
+        result = CompileResult(
+            b"",
+            cached=True,
+            document_id=pdf_key,
+            page_count=await _cached_page_count(pdf_key),
+        )
+        return _pinned_result(result, pinned)
+
+    job = {"kind": "pdf_file", "latex": latex_text, "lane": lane}
+    result = await _run_queued(job, pdf_key)
+    if result.data:
+        # Too big for the cache, so the worker sent it back
+        return result
+
+    pinned = await _cache_pin(_served_key(pdf_key), count=False)
+    if pinned is not None:
+        return _pinned_result(result, pinned)
+    # This process does not share CACHE_DIR with the workers
+    return await compile_latex_to_pdf(latex_text, lane)
+
+
+async def _shared_pdf_file(latex_text: str, lane: int) -> CompileResult:
+    # Run by a worker: the PDF stays in the shared cache for the API to
+    # stream, and only a PDF that could not be cached goes through MongoDB
+    if cache is None:
+        return await _local_pdf(latex_text, lane)
+
+    result = await _local_pdf_file(latex_text, lane)
+    if result.release is not None:
+        await result.release()
+    return replace(result, path=None, release=None)
+
+
+async def _check_queue_length() -> None:
+    queued = await compile_queue.queued_count()
+    if queued >= scheduler.max_queue:
+        scheduler.rejected += 1
+        raise CompileQueueFull(max(1, math.ceil((queued + 1) / scheduler.max_jobs)))
+
+
+def _raise_known_failure(pdf_key: str) -> None:
+    error = failures.get(pdf_key)
+    if error is not None:
+        raise error.with_traceback(None)
+
+
+async def _single_flight(
+    key: str, job: Callable[[], Awaitable[CompileResult]]
+) -> CompileResult:
+    # Identical requests arriving together wait on one compile
+    result, shared = await flights.run(key, job)
+    return replace(result, coalesced=True) if shared else result
+
+
+def _cache_key(latex_text: str, kind: str, dpi: Optional[int] = None) -> str:
+    return CompileCache.make_key(latex_text, kind, ENGINE_KEY, dpi)
+
 
-        with open(pdf_path, "rb") as f:
-            return f.read()
+def _page_key(document_id: str, page: int, dpi: int) -> str:
+    return CompileCache.make_key(document_id, f"page-{page}", ENGINE_KEY, dpi)
+
+
+def _web_key(document_id: str) -> str:
+    return CompileCache.make_key(document_id, "pdf-web", ENGINE_KEY)
+
+
+def _web_failed_key(document_id: str) -> str:
+    return CompileCache.make_key(document_id, "pdf-web-failed", ENGINE_KEY)
+
+
+def _served_key(pdf_key: str) -> str:
+    # Downloads get the optimized copy unless qpdf could not produce one
+    if PDF_OPTIMIZE and not _cache_has(_web_failed_key(pdf_key)):
+        return _web_key(pdf_key)
+    return pdf_key
+
+
+def _page_count_key(document_id: str) -> str:
+    return CompileCache.make_key(document_id, "page-count", ENGINE_KEY)
+
+
+async def _cached_page(document_id: str, page: int, dpi: int) -> Optional[bytes]:
+    cached = await _cache_get(_page_key(document_id, page, dpi))
+    if cached is not None:
+        return cached
+
+    # Scaling down an already rendered higher tier is far cheaper than gs
+    for tier in sorted(PREVIEW_TIERS.values()):
+        if tier <= dpi or not _cache_has(_page_key(document_id, page, tier)):
+            continue
+        higher = await _cache_get(_page_key(document_id, page, tier))
+        if higher is None:
+            continue
+        webp_bytes = await _run_image(_scale_webp, higher, dpi / tier)
+        await _cache_put(_page_key(document_id, page, dpi), webp_bytes)
+        return webp_bytes
+
+    return None
+
+
+async def _render_page(
+    pdf_path: str, document_id: str, page: int, dpi: int, timings: dict[str, float]
+) -> bytes:
+    # Lower tiers come from the same raster, so render them in one go
+    dpis = [dpi] + [
+        tier
+        for tier in PREVIEW_TIERS.values()
+        if tier < dpi and not _cache_has(_page_key(document_id, page, tier))
+    ]
+    images = await _pdf_to_webp(pdf_path, dpis, timings, page=page)
+
+    for tier_dpi, webp_bytes in images.items():
+        await _cache_put(_page_key(document_id, page, tier_dpi), webp_bytes)
+    return images[dpi]
+
+
+async def _cached_page_count(document_id: str) -> int:
+    data = await _cache_get(_page_count_key(document_id))
+    return int(data) if data else 0
+
+
+async def _ensure_pdf(
+    latex_text: str,
+    pdf_key: str,
+    work_dir: str,
+    timings: dict[str, float],
+    session: Optional[CompileSession] = None,
+) -> tuple[str, int, int]:
+    pdf_path = os.path.join(work_dir, "resume.pdf")
+    if session is not None and session.pdf_key == pdf_key:
+        # Unchanged since the last preview, e.g. when only the tier changed
+        if await _run_io(os.path.exists, pdf_path):
+            return pdf_path, 0, session.page_count
+
+    if await _cache_copy(pdf_key, pdf_path):
+        page_count = await _cached_page_count(pdf_key)
+        if not page_count:
+            page_count = await _count_pdf_pages(pdf_path)
+            await _cache_put(_page_count_key(pdf_key), str(page_count).encode())
+        _remember_pdf(session, pdf_key, page_count)
+        return pdf_path, 0, page_count
+
+    if session is not None:
+        # A stale PDF or log would hide a failure of this run
+        await _run_io(_remove_outputs, work_dir)
+
+    with timed(timings, "tex"):
+        try:
+            pdf_path, passes = await _compile_to_pdf(
+                latex_text, work_dir, timings, session
+            )
+        except (LatexCompileError, ResourceLimitExceeded) as e:
+            failures.put(pdf_key, e)
+            if session is not None:
+                # The .aux of a failed run may be truncated
+                await _run_io(_remove_outputs, work_dir, True)
+            raise
+
+    page_count = await _run_io(_read_page_count, work_dir)
+    if not page_count:
+        page_count = await _count_pdf_pages(pdf_path)
+    if cache is not None:
+        await _run_io(cache.put_file, pdf_key, pdf_path)
+    await _cache_put(_page_count_key(pdf_key), str(page_count).encode())
+    _remember_pdf(session, pdf_key, page_count)
+    return pdf_path, passes, page_count
+
+
+def _remember_pdf(
+    session: Optional[CompileSession], pdf_key: str, page_count: int
+) -> None:
+    if session is not None:
+        session.pdf_key = pdf_key
+        session.page_count = page_count
+
+
+async def _cache_get(key: str) -> Optional[bytes]:
+    if cache is None:
+        return None
+    return await _run_io(cache.get, key)
+
+
+async def _cache_locate(key: str) -> Optional[str]:
+    if cache is None:
+        return None
+    return await _run_io(cache.locate, key)
+
+
+async def _cache_pin(key: str, count: bool = True) -> Optional[str]:
+    if cache is None:
+        return None
+    return await _run_io(cache.pin, key, count)
+
+
+def _pinned_result(result: CompileResult, pinned: str) -> CompileResult:
+    async def release() -> None:
+        await _run_io(cache.unpin, pinned)
+
+    return replace(result, path=pinned, release=release)
+
+
+async def _cache_copy(key: str, destination: str) -> bool:
+    cached_path = await _cache_locate(key)
+    if cached_path is None:
+        return False
+    try:
+        await _run_io(shutil.copyfile, cached_path, destination)
+    except FileNotFoundError:
+        # Evicted between the lookup and the copy
+        return False
+    return True
+
+
+def _cache_has(key: str) -> bool:
+    return cache is not None and cache.contains(key)
+
+
+async def _cache_put(key: str, data: bytes) -> None:
+    if cache is not None:
+        await _run_io(cache.put, key, data)
+
+
+@asynccontextmanager
+async def _work_dir() -> AsyncIterator[str]:
+    path = await _run_io(work_dirs.acquire)
+    try:
+        yield path
     finally:
-        shutil.rmtree(work_dir, ignore_errors=True)
+        await _run_io(work_dirs.release, path)
+
+
+@asynccontextmanager
+async def _session_or_work_dir(
+    session_id: Optional[str], lane: int
+) -> AsyncIterator[tuple[str, Optional[CompileSession]]]:
+    """
+    Hold a compile slot and a directory to compile in: the resume's session
+    directory when there is a session, a pooled one otherwise.
+    """
+    for path in sessions.expire():
+        await _run_io(shutil.rmtree, path, True)
 
+    if session_id is None:
+        async with scheduler.slot(lane), _work_dir() as work_dir:
+            yield work_dir, None
+        return
 
-async def _compile_to_pdf(latex_text: str, work_dir: str) -> str:
+    session = sessions.get(session_id)
+    # Previews of one resume take turns in its directory. The slot is taken
+    # once it is this preview's turn, so previews queued behind the session
+    # lock do not hold slots that other compiles could use.
+    async with session.lock, scheduler.slot(lane):
+        if session.work_dir is None:
+            session.work_dir = await _run_io(
+                tempfile.mkdtemp, "", SESSION_PREFIX, work_dirs.owner_dir
+            )
+        try:
+            yield session.work_dir, session
+        finally:
+            session.compiles += 1
+            session.last_used = time.monotonic()
+
+
+def _remove_outputs(work_dir: str, include_aux: bool = False) -> None:
+    names = ["resume.pdf", "resume.log"] + (["resume.aux"] if include_aux else [])
+    for name in names:
+        try:
+            os.unlink(os.path.join(work_dir, name))
+        except FileNotFoundError:
+            pass
+
+
+async def _run_io(func: Callable[..., T], *args) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, partial(func, *args))
+
+
+async def _run_image(func: Callable[..., T], *args) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(image_executor, partial(func, *args))
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+async def _compile_to_pdf(
+    latex_text: str,
+    work_dir: str,
+    timings: dict[str, float],
+    session: Optional[CompileSession] = None,
+) -> tuple[str, int]:
     tex_path = os.path.join(work_dir, "resume.tex")
     pdf_path = os.path.join(work_dir, "resume.pdf")
 
-    with open(tex_path, "w", encoding="utf-8") as f:
-        f.write(latex_text)
+    with timed(timings, "write"):
+        await _run_io(_write_bytes, tex_path, latex_text.encode("utf-8"))
+
+    # The precompiled preamble is tried first, plain engines are the fallback
+    attempts: list[tuple[str, Optional[str]]] = [(engine, None) for engine in ENGINES]
+    fmt_name = await find_format(latex_text)
+    if fmt_name:
+        attempts.insert(0, ("pdflatex", fmt_name))
+    remembered = session.attempt if session is not None else None
+    if remembered == ("pdflatex", None) and fmt_name:
+        # Remembered from before the format was built, so the format was
+        # never tried for this resume
+        remembered = None
+    if remembered in attempts:
+        # Skip attempts that already failed for this resume
+        attempts.remove(remembered)
+        attempts.insert(0, remembered)
+
+    draft_first = settings.latex_draft_first_pass and bool(
+        MULTI_PASS_RE.search(latex_text)
+    )
+    if draft_first and session is not None:
+        # With the previous .aux in place the first real pass usually settles
+        draft_first = not await _run_io(
+            os.path.exists, os.path.join(work_dir, "resume.aux")
+        )
 
     error_output = ""
-    for compiler in ["pdflatex", "xelatex"]:
-        # Run twice to resolve references
-        for _ in range(2):
-            try:
-                process = await asyncio.create_subprocess_exec(
-                    compiler,
-                    "-interaction=nonstopmode",
-                    "-output-directory",
-                    work_dir,
-                    tex_path,
+    errors: list[TexError] = []
+    total_passes = 0
+    format_failed = False
+    for compiler, fmt in attempts:
+        args = [compiler, "-interaction=nonstopmode"]
+        if fmt:
+            args.append(f"-fmt={fmt}")
+        args += ["-output-directory", work_dir, tex_path]
+
+        try:
+            passes, error_output = await _run_passes(
+                args,
+                work_dir,
+                draft_first,
+                format_env() if fmt else None,
+                timings,
+                first_pass=total_passes + 1,
+            )
+        except FileNotFoundError:
+            continue
+        total_passes += passes
+
+        if os.path.exists(pdf_path):
+            if format_failed and not fmt and compiler == "pdflatex":
+                # Plain pdflatex managed what the format could not
+                discard_format(fmt_name)
+            if session is not None:
+                session.attempt = (compiler, fmt)
+            return pdf_path, total_passes
+
+        format_failed = format_failed or fmt is not None
+        errors = await _run_io(_read_log_errors, work_dir)
+        if not _fallback_can_help(fmt, errors):
+            break
+
+    if not total_passes:
+        raise Exception("No LaTeX engine found. Please install pdflatex or xelatex.")
+
+    raise LatexCompileError(
+        errors, await _run_io(_read_log_tail, work_dir), error_output
+    )
+
+
+async def _communicate(
+    process: asyncio.subprocess.Process, timeout: float
+) -> tuple[bytes, bytes]:
+    try:
+        return await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except BaseException:
+        # Timed out, or the job was cancelled: the process must not outlive it
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        raise
+
+
+def _fallback_can_help(fmt: Optional[str], errors: list[TexError]) -> bool:
+    if not errors:
+        # Nothing to go on, e.g. the engine crashed
+        return True
+    if any(ENCODING_ERROR_RE.search(error.message) for error in errors):
+        return True
+    if fmt:
+        # Errors pinned to a source line are in the document, not the format
+        return not any(error.line for error in errors)
+    return False
+
+
+async def _run_passes(
+    args: list[str],
+    work_dir: str,
+    draft_first: bool,
+    env: Optional[dict],
+    timings: dict[str, float],
+    first_pass: int = 1,
+) -> tuple[int, str]:
+    aux_path = os.path.join(work_dir, "resume.aux")
+    log_path = os.path.join(work_dir, "resume.log")
+
+    previous_aux = await _run_io(_read_aux_references, aux_path)
+    error_output = ""
+    passes = 0
+    while passes < MAX_PASSES:
+        # A draft pass skips writing the PDF; only worth it when a real pass follows
+        draft = draft_first and passes == 0 and MAX_PASSES > 1
+        pass_args = [args[0], "-draftmode", *args[1:]] if draft else args
+
+        try:
+            with timed(timings, f"tex_pass_{first_pass + passes}"):
+                process = await create_limited_subprocess(
+                    *pass_args,
                     stdout=asyncio.subprocess.PIPE,
                     stderr=asyncio.subprocess.PIPE,
+                    env=env,
                 )
 
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(), timeout=TIMEOUT
-                )
+                stdout, stderr = await _communicate(process, TIMEOUT)
+        except asyncio.TimeoutError:
+            raise Exception(f"Compilation timed out after {TIMEOUT} seconds")
+
+        error_output = stderr.decode("utf-8", errors="ignore")
+        passes += 1
+        # Retrying a document that hit a limit, even with another engine, is futile
+        check_limits(args[0], process.returncode, error_output)
+
+        if await _run_io(_pass_failed, work_dir, draft):
+            # Further passes see the same input and fail the same way
+            break
+
+        current_aux = await _run_io(_read_aux_references, aux_path)
+        if not draft and not await _run_io(
+            _needs_rerun, previous_aux, current_aux, log_path
+        ):
+            break
+        previous_aux = current_aux
+
+    return passes, error_output
+
+
+def _read_aux_references(aux_path: str) -> Optional[list[str]]:
+    if not os.path.exists(aux_path):
+        return None
+
+    with open(aux_path, "r", encoding="utf-8", errors="ignore") as f:
+        return [line for line in f if line.startswith(AUX_REFERENCE_PREFIXES)]
+
+
+def _needs_rerun(
+    previous_aux: Optional[list[str]], current_aux: Optional[list[str]], log_path: str
+) -> bool:
+    if (previous_aux or []) != (current_aux or []):
+        return True
+
+    if not os.path.exists(log_path):
+        return False
+
+    with open(log_path, "r", encoding="utf-8", errors="ignore") as f:
+        return bool(RERUN_RE.search(f.read()))
+
+
+def _pass_failed(work_dir: str, draft: bool) -> bool:
+    if not draft:
+        return not os.path.exists(os.path.join(work_dir, "resume.pdf"))
+
+    log_path = os.path.join(work_dir, "resume.log")
+    if not os.path.exists(log_path):
+        return True
 
-                error_output = stderr.decode("utf-8", errors="ignore")
+    with open(log_path, "r", encoding="utf-8", errors="ignore") as f:
+        return bool(FATAL_ERROR_RE.search(f.read()))
 
-            except asyncio.TimeoutError:
-                raise Exception(f"Compilation timed out after {TIMEOUT} seconds")
-            except FileNotFoundError:
+
+def _read_log_errors(work_dir: str) -> list[TexError]:
+    log_path = os.path.join(work_dir, "resume.log")
+    if not os.path.exists(log_path):
+        return []
+
+    with open(log_path, "r", encoding="utf-8", errors="ignore") as f:
+        lines = f.read().splitlines()
+
+    errors: list[TexError] = []
+    for index, line in enumerate(lines):
+        if not line.startswith("! ") or FATAL_ERROR_RE.search(line):
+            continue
+
+        error = TexError(line[2:].strip())
+        # TeX reports where it stopped a few lines below the message
+        for following in lines[index + 1 : index + 12]:
+            if following.startswith("! "):
+                break
+            match = TEX_ERROR_LINE_RE.match(following)
+            if match:
+                error.line = int(match.group(1))
+                error.context = match.group(2).strip()
                 break
 
-        if os.path.exists(pdf_path):
-            return pdf_path
+        errors.append(error)
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            break
+    return errors
 
+
+def _read_log_tail(work_dir: str) -> str:
     log_path = os.path.join(work_dir, "resume.log")
-    log_content = ""
-    if os.path.exists(log_path):
-        with open(log_path, "r", encoding="utf-8", errors="ignore") as f:
-            lines = f.readlines()
-            log_content = "".join(lines[-50:])
-
-    raise Exception(
-        f"PDF compilation failed.\nError: {error_output}\nLog:\n{log_content}"
-    )
+    if not os.path.exists(log_path):
+        return ""
 
+    with open(log_path, "r", encoding="utf-8", errors="ignore") as f:
+        return "".join(f.readlines()[-50:])
 
-async def _pdf_to_webp(pdf_path: str, output_path: str, dpi: int = 150) -> str:
-    png_path = output_path.replace(".webp", ".png")
 
+def _read_page_count(work_dir: str) -> int:
+    log_path = os.path.join(work_dir, "resume.log")
+    if not os.path.exists(log_path):
+        return 0
+
+    with open(log_path, "r", encoding="utf-8", errors="ignore") as f:
+        # TeX wraps long log lines, so the summary may be split anywhere
+        tail = f.read()[-2000:].replace("\n", "")
+
+    match = OUTPUT_PAGES_RE.search(tail)
+    return int(match.group(1)) if match else 0
+
+
+async def _count_pdf_pages(pdf_path: str) -> int:
+    # Only a fallback for when the TeX log has no page count. The PDF may come
+    # from arbitrary user LaTeX, so gs stays in SAFER mode with read access to
+    # this one file, and the path is passed as a string value instead of
+    # being spliced into PostScript.
     try:
-        process = await asyncio.create_subprocess_exec(
+        process = await create_limited_subprocess(
             "gs",
-            "-dNOPAUSE",
-            "-dBATCH",
+            "-q",
+            "-dNODISPLAY",
             "-dSAFER",
-            "-sDEVICE=png16m",
-            f"-r{dpi}",
-            "-dFirstPage=1",
-            "-dLastPage=1",
-            f"-sOutputFile={png_path}",
-            pdf_path,
+            "-dBATCH",
+            f"--permit-file-read={pdf_path}",
+            f"-sPDFFile={pdf_path}",
+            "-c",
+            "PDFFile (r) file runpdfbegin pdfpagecount = quit",
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
-
-        await asyncio.wait_for(process.communicate(), timeout=30)
-
+        stdout, stderr = await _communicate(process, 30)
     except asyncio.TimeoutError:
-        raise Exception("PDF to PNG conversion timed out")
+        raise Exception("Counting PDF pages timed out")
     except FileNotFoundError:
         raise Exception("Ghostscript (gs) not found. Please install ghostscript.")
 
-    if not os.path.exists(png_path):
-        raise Exception("Failed to convert PDF to PNG")
+    check_limits("gs", process.returncode, stderr.decode("utf-8", errors="ignore"))
+    lines = stdout.decode("utf-8", errors="ignore").strip().splitlines()
+    if process.returncode != 0 or not lines or not lines[-1].isdigit():
+        raise Exception("Failed to count PDF pages")
+    page_count = int(lines[-1])
+    if page_count < 1:
+        raise Exception("Failed to count PDF pages")
+    return page_count
 
-    try:
-        with Image.open(png_path) as img:
-            img.save(output_path, "WEBP", quality=85)
-    finally:
-        if os.path.exists(png_path):
-            os.remove(png_path)
 
-    return output_path
+async def _pdf_to_webp(
+    pdf_path: str, dpis: list[int], timings: dict[str, float], page: int = 1
+) -> dict[int, bytes]:
+    dpi = max(dpis)
+
+    # Raw PPM on stdout avoids a PNG compress/decompress round trip and disk
+    with timed(timings, "rasterize"):
+        try:
+            process = await create_limited_subprocess(
+                "gs",
+                "-q",
+                "-dNOPAUSE",
+                "-dBATCH",
+                "-dSAFER",
+                "-sstdout=%stderr",
+                "-sDEVICE=ppmraw",
+                f"-r{dpi}",
+                f"-dFirstPage={page}",
+                f"-dLastPage={page}",
+                "-sOutputFile=-",
+                pdf_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+
+            image_bytes, stderr = await _communicate(process, 30)
+
+        except asyncio.TimeoutError:
+            raise Exception("PDF to image conversion timed out")
+        except FileNotFoundError:
+            raise Exception("Ghostscript (gs) not found. Please install ghostscript.")
+
+    check_limits("gs", process.returncode, stderr.decode("utf-8", errors="ignore"))
+    if process.returncode != 0 or not image_bytes:
+        raise Exception("Failed to convert PDF to image")
+
+    with timed(timings, "encode"):
+        return await _run_image(_encode_tiers, image_bytes, dpis, dpi)
+
+
+def _encode_tiers(image_bytes: bytes, dpis: list[int], dpi: int) -> dict[int, bytes]:
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        return {target: _encode_webp(img, target / dpi) for target in dpis}
+
+
+def _scale_webp(webp_bytes: bytes, scale: float) -> bytes:
+    with Image.open(io.BytesIO(webp_bytes)) as img:
+        return _encode_webp(img, scale)
+
+
+def _encode_webp(img: Image.Image, scale: float = 1.0) -> bytes:
+    if scale < 1.0:
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    img.save(output, "WEBP", quality=85)
+    return output.getvalue()
 
 
 def get_latex_version() -> Optional[str]:
@@ -0,0 +1,54 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a fixed sleep.
+
+    Anything that blocks the loop (file I/O, image encoding, a slow
+    synchronous call) shows up as lag, since the sleeping task can only
+    resume once the loop gets back to it.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_ms": self.interval * 1000,
+            "last_ms": self.last * 1000,
+            "max_ms": self.max * 1000,
+            "avg_ms": self.total / self.samples * 1000 if self.samples else 0.0,
+            "samples": self.samples,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.last = lag
+            self.max = max(self.max, lag)
+            self.total += lag
+            self.samples += 1
@@ -0,0 +1,104 @@
+import asyncio
+import re
+import time
+import zipfile
+from typing import AsyncIterator, Optional
+
+from ..config import get_settings
+from ..models.sections import ResumeData
+from .latex_compiler import compile_latex_to_pdf
+from .template_engine import generate_latex
+
+settings = get_settings()
+UNSAFE_FILENAME_RE = re.compile(r"[^A-Za-z0-9_\- .()]+")
+
+
+class _ZipBuffer:
+    """
+    Write-only file object that hands out what zipfile wrote so far.
+
+    It has no tell() or seek(), so zipfile streams entries with data
+    descriptors instead of seeking back to patch headers.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def export_resumes_zip(resumes: list[dict]) -> AsyncIterator[bytes]:
+    """
+    Compile every resume and stream them as a ZIP archive.
+
+    At most EXPORT_MAX_PARALLEL compiles run at a time, and each PDF is
+    written to the archive and sent as soon as it is ready, so only the
+    PDFs in flight are held in memory. Resumes that fail to compile get a
+    text entry with the error instead of a PDF.
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.export_max_parallel))
+
+    async def compile_one(resume: dict) -> tuple[dict, Optional[bytes], str]:
+        async with semaphore:
+            try:
+                latex_text = generate_latex(ResumeData(**resume["data"]))
+                result = await compile_latex_to_pdf(latex_text)
+            except Exception as e:
+                return resume, None, str(e)
+        return resume, result.data, ""
+
+    tasks = [asyncio.create_task(compile_one(resume)) for resume in resumes]
+    buffer = _ZipBuffer()
+    names: set[str] = set()
+
+    try:
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for next_done in asyncio.as_completed(tasks):
+                resume, pdf_bytes, error = await next_done
+                title = resume.get("title") or resume["_id"]
+                if pdf_bytes is not None:
+                    name = _unique_name(title, ".pdf", names)
+                    # PDFs are already compressed; storing them is much cheaper
+                    archive.writestr(_zip_info(name), pdf_bytes)
+                else:
+                    name = _unique_name(title, ".error.txt", names)
+                    info = _zip_info(name, zipfile.ZIP_DEFLATED)
+                    archive.writestr(info, f"Compilation failed:\n{error}\n")
+                yield buffer.take()
+        yield buffer.take()
+    finally:
+        # The client may disconnect halfway through the archive
+        for task in tasks:
+            task.cancel()
+
+
+def safe_filename(title: str, default: str = "resume") -> str:
+    return UNSAFE_FILENAME_RE.sub("_", title).strip(" .") or default
+
+
+def _unique_name(title: str, suffix: str, names: set[str]) -> str:
+    base = safe_filename(title)
+    name = f"{base}{suffix}"
+    counter = 2
+    while name in names:
+        name = f"{base} ({counter}){suffix}"
+        counter += 1
+    names.add(name)
+    return name
+
+
+def _zip_info(name: str, compress_type: int = zipfile.ZIP_STORED) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = compress_type
+    info.external_attr = 0o644 << 16
+    return info
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import re
+import resource
+import shutil
+import signal
+from typing import Optional
+
+from ..config import get_settings
+
+settings = get_settings()
+# How a limit shows up on stderr, which unlike TeX's stdout never echoes
+# the document itself
+MEMORY_ERROR_RE = re.compile(
+    r"memory exhausted|out of memory|Cannot allocate memory|VMerror|bad_alloc",
+    re.IGNORECASE,
+)
+# Processes that ignore SIGXFSZ see EFBIG instead
+OUTPUT_ERROR_RE = re.compile(r"File too large")
+PROCESS_ERROR_RE = re.compile(
+    r"Resource temporarily unavailable|fork(?:ing)? failed|cannot fork", re.IGNORECASE
+)
+
+
+class ResourceLimitExceeded(Exception):
+    resource = "resources"
+
+    def __init__(self, program: str):
+        super().__init__(
+            f"{program} exceeded the {self.resource} limit and was stopped"
+        )
+        self.program = program
+
+
+class CpuLimitExceeded(ResourceLimitExceeded):
+    resource = "cpu"
+
+
+class MemoryLimitExceeded(ResourceLimitExceeded):
+    resource = "memory"
+
+
+class OutputLimitExceeded(ResourceLimitExceeded):
+    resource = "output"
+
+
+class ProcessLimitExceeded(ResourceLimitExceeded):
+    resource = "processes"
+
+
+LIMIT_ERRORS = {
+    error.resource: error
+    for error in (
+        CpuLimitExceeded,
+        MemoryLimitExceeded,
+        OutputLimitExceeded,
+        ProcessLimitExceeded,
+    )
+}
+breaches = {name: 0 for name in LIMIT_ERRORS}
+
+
+def _limits() -> list[tuple[int, int, int]]:
+    """The configured (resource, soft, hard) rlimits; a limit of 0 is left unset."""
+    if not settings.sandbox_enabled:
+        return []
+
+    cpu = settings.sandbox_cpu_seconds
+    limits = [
+        # SIGXCPU at the soft limit, SIGKILL a second later if it is ignored
+        (resource.RLIMIT_CPU, cpu, cpu + 1),
+        (resource.RLIMIT_AS, settings.sandbox_memory_bytes, None),
+        (resource.RLIMIT_FSIZE, settings.sandbox_output_bytes, None),
+        (resource.RLIMIT_NPROC, settings.sandbox_max_processes, None),
+    ]
+
+    applied = []
+    for kind, soft, hard in limits:
+        if soft <= 0:
+            continue
+        hard = hard or soft
+        # A child cannot raise a hard limit above what this process has
+        _, current = resource.getrlimit(kind)
+        if current != resource.RLIM_INFINITY:
+            hard = min(hard, current)
+            soft = min(soft, hard)
+        applied.append((kind, soft, hard))
+    return applied
+
+
+LIMITS = _limits()
+PRLIMIT = shutil.which("prlimit")
+PRLIMIT_OPTIONS = {
+    resource.RLIMIT_CPU: "--cpu",
+    resource.RLIMIT_AS: "--as",
+    resource.RLIMIT_FSIZE: "--fsize",
+    resource.RLIMIT_NPROC: "--nproc",
+}
+
+
+async def create_limited_subprocess(
+    program: str, *args: str, **kwargs
+) -> asyncio.subprocess.Process:
+    """
+    asyncio.create_subprocess_exec with the configured rlimits applied.
+
+    The program is exec'd through prlimit(1), which sets the limits in the
+    child itself. A preexec_fn is not safe here, since the compile I/O and
+    image threads are always running and the child could deadlock between
+    fork and exec. Without prlimit(1) the limits are set on the running
+    child with prlimit(2) right after it starts.
+    """
+    path = shutil.which(program, path=(kwargs.get("env") or os.environ).get("PATH"))
+    if path is None:
+        raise FileNotFoundError(program)
+
+    command = [path, *args]
+    if LIMITS and PRLIMIT is not None:
+        options = [
+            f"{PRLIMIT_OPTIONS[kind]}={soft}:{hard}" for kind, soft, hard in LIMITS
+        ]
+        command = [PRLIMIT, *options, "--", *command]
+
+    process = await asyncio.create_subprocess_exec(*command, **kwargs)
+    if LIMITS and PRLIMIT is None:
+        for kind, soft, hard in LIMITS:
+            try:
+                resource.prlimit(process.pid, kind, (soft, hard))
+            except (ProcessLookupError, ValueError, OSError):
+                # Already exited, or the limit cannot be applied
+                pass
+    return process
+
+
+def check_limits(program: str, returncode: Optional[int], stderr: str) -> None:
+    """
+    Raise the matching ResourceLimitExceeded if a limit stopped the process.
+    """
+    if not settings.sandbox_enabled or not returncode:
+        return
+
+    cpu_limited = any(kind == resource.RLIMIT_CPU for kind, _, _ in LIMITS)
+    # SIGKILL comes from the hard CPU limit when SIGXCPU was not enough;
+    # timeouts kill the process too, but never reach this check
+    if returncode == -signal.SIGXCPU or (returncode == -signal.SIGKILL and cpu_limited):
+        name = "cpu"
+    elif returncode == -signal.SIGXFSZ or OUTPUT_ERROR_RE.search(stderr):
+        name = "output"
+    elif MEMORY_ERROR_RE.search(stderr):
+        name = "memory"
+    elif PROCESS_ERROR_RE.search(stderr):
+        name = "processes"
+    else:
+        return
+
+    breaches[name] += 1
+    raise LIMIT_ERRORS[name](program)
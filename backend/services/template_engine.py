@@ -1,347 +1,349 @@
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional, TextIO
 
+from ..config import get_settings
 from ..models.sections import (
+    AwardEntry,
     AwardsSection,
+    CustomEntry,
     CustomSection,
+    EducationEntry,
     EducationSection,
+    ExperienceEntry,
     ExperienceSection,
     PersonalInfo,
+    ProjectEntry,
     ProjectsSection,
     ResumeData,
+    SkillCategory,
     SkillsSection,
 )
-from .escape_latex import escape_latex, escape_url
+from .escape_latex import escape_latex, escape_latex_many, escape_url
+from .fragment_cache import FragmentCache
+from .metrics import timed
+from .template_registry import LatexTemplate, templates
 
+settings = get_settings()
+# Rendered sections and entries, so a preview only re-renders what changed
+fragments = FragmentCache(settings.latex_fragment_cache_size)
 
-def generate_latex(data: ResumeData) -> str:
-    contact_items: List[str] = []
+KNOWN_SECTIONS = ("education", "skills", "experience", "projects", "honors_and_awards")
 
-    if data.heading.phone:
-        contact_items.append(escape_latex(data.heading.phone))
 
-    if data.heading.email:
-        email = escape_latex(data.heading.email)
-        contact_items.append(f"\\href{{mailto:{email}}}{{\\textbf{{{email}}}}}")
+def generate_latex(data: ResumeData, timings: Optional[Dict[str, float]] = None) -> str:
+    if timings is None:
+        timings = {}
 
-    for social in data.heading.socials:
-        if social.url:
-            url = escape_url(social.url)
-            name = escape_latex(social.name)
-            contact_items.append(f"\\href{{{url}}}{{\\textbf{{{name}}}}}")
+    with timed(timings, "latex"):
+        return "".join(iter_latex(data, timings))
+
+
+def iter_latex(
+    data: ResumeData, timings: Optional[Dict[str, float]] = None
+) -> Iterator[str]:
+    """
+    Generate the document as a stream of LaTeX chunks.
+
+    Sections are rendered as the stream reaches them, so the document is
+    never held in one piece. The template is looked up right away, so an
+    unknown template raises here rather than partway through the stream.
+    """
+    if timings is None:
+        timings = {}
+
+    template = templates.get(data.template)
+    return _iter_latex(data, template, timings)
+
+
+def write_latex(
+    data: ResumeData, out: TextIO, timings: Optional[Dict[str, float]] = None
+) -> None:
+    """Write the document to any text sink: an open file, a StringIO, ..."""
+    out.writelines(iter_latex(data, timings))
+
+
+def list_templates() -> List[Dict[str, str]]:
+    return [
+        {"name": template.name, "title": template.title} for template in templates.all()
+    ]
+
+
+def get_fragment_stats() -> dict:
+    return fragments.stats()
+
+
+def _iter_latex(
+    data: ResumeData, template: LatexTemplate, timings: Dict[str, float]
+) -> Iterator[str]:
+    heading = fragments.render(data.heading, _generate_heading, template)
+    yield from template.iter_document(heading, _iter_sections(data, template, timings))
 
-    contact_line = f"\\small {' $|$ '.join(contact_items)}" if contact_items else ""
 
-    section_content = []
+def _iter_sections(
+    data: ResumeData, template: LatexTemplate, timings: Dict[str, float]
+) -> Iterator[str]:
     for section_key in data.section_order:
-        content = _generate_section(section_key, data)
+        # Custom section keys are user-defined, so they share one stage
+        stage = section_key if section_key in KNOWN_SECTIONS else "custom"
+        with timed(timings, f"latex_{stage}"):
+            content = _generate_section(section_key, data, template)
         if content:
-            section_content.append(content)
+            yield content
 
-    section_latex = "\n".join(section_content)
-
-    return _build_document(data.heading, contact_line, section_latex)
 
+def find_field(data: ResumeData, latex_line: str) -> Optional[str]:
+    """
+    Best guess at which ResumeData field produced a line of generated LaTeX.
 
-def _generate_section(section_key: str, data: ResumeData) -> str:
+    Returns a path such as "experience.items[0].description", picking the
+    longest field value that appears in the line once escaped.
+    """
+    best_path, best_length = None, 0
+    for path, value in _string_fields(data.model_dump(exclude={"template"}), ""):
+        for candidate in (escape_latex(value), escape_url(value)):
+            if len(candidate) > best_length and candidate in latex_line:
+                best_path, best_length = path, len(candidate)
+    return best_path
+
+
+def _string_fields(value: Any, path: str) -> Iterator[tuple[str, str]]:
+    if isinstance(value, str):
+        if value.strip():
+            yield path, value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _string_fields(item, f"{path}.{key}" if path else key)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _string_fields(item, f"{path}[{index}]")
+
+
+def _generate_section(
+    section_key: str, data: ResumeData, template: LatexTemplate
+) -> str:
     if section_key == "education":
-        return _generate_education(data.education)
+        return fragments.render(data.education, _generate_education, template)
     elif section_key == "skills":
-        return _generate_skills(data.skills)
+        return fragments.render(data.skills, _generate_skills, template)
     elif section_key == "experience":
-        return _generate_experience(data.experience)
+        return fragments.render(data.experience, _generate_experience, template)
     elif section_key == "projects":
-        return _generate_projects(data.projects)
+        return fragments.render(data.projects, _generate_projects, template)
     elif section_key == "honors_and_awards":
-        return _generate_awards(data.honors_and_awards)
+        return fragments.render(data.honors_and_awards, _generate_awards, template)
     else:
         for custom in data.custom_sections:
             if custom.section_type == section_key:
-                return _generate_custom_section(custom)
+                return fragments.render(custom, _generate_custom_section, template)
 
     return ""
 
 
-def _generate_education(education: EducationSection) -> str:
-    if not education.entries:
-        return ""
+def _generate_heading(heading: PersonalInfo, template: LatexTemplate) -> str:
+    contact_items: List[str] = []
+
+    if heading.phone:
+        contact_items.append(escape_latex(heading.phone))
 
-    entries_latex = []
-    for edu in education.entries:
-        marks_str = f"; {escape_latex(edu.marks)}" if edu.marks else ""
-        entries_latex.append(
-            f"""
-            \\resumeSubheading
-            {{{escape_latex(edu.institution)}}}{{{escape_latex(edu.location)}}}
-            {{{escape_latex(edu.degree)}{marks_str}}}
-            {{{escape_latex(edu.start_date)} -- {escape_latex(edu.end_date)}}}
-        """
+    if heading.email:
+        contact_items.append(
+            template.render("email", email=escape_latex(heading.email))
         )
 
-    return f"""
-    \\section{{{escape_latex(education.section_title)}}}
-    \\resumeSubHeadingListStart
-    {"".join(entries_latex)}
-    \\resumeSubHeadingListEnd
-    """
+    for social in heading.socials:
+        if social.url:
+            contact_items.append(
+                template.render(
+                    "social", url=escape_url(social.url), name=escape_latex(social.name)
+                )
+            )
+
+    contact_line = ""
+    if contact_items:
+        separator = template.settings["contact_separator"]
+        contact_line = template.render(
+            "contact_line", contacts=separator.join(contact_items)
+        )
+
+    location_line = ""
+    if heading.location:
+        location_line = template.render(
+            "location_line", location=escape_latex(heading.location)
+        )
 
+    return template.render(
+        "heading",
+        name=escape_latex(heading.name),
+        contact_line=contact_line,
+        location_line=location_line,
+    )
 
-def _generate_skills(skills: SkillsSection) -> str:
+
+def _generate_items(items: List[str], template: LatexTemplate) -> str:
+    return "\n".join(
+        template.render("item", text=text) for text in escape_latex_many(items)
+    )
+
+
+def _generate_entries(entries: list, render, template: LatexTemplate) -> str:
+    rendered = (fragments.render(entry, render, template) for entry in entries)
+    return "\n".join(latex for latex in rendered if latex)
+
+
+def _generate_education(education: EducationSection, template: LatexTemplate) -> str:
+    if not education.entries:
+        return ""
+
+    return template.render(
+        "section_education",
+        title=escape_latex(education.section_title),
+        entries=_generate_entries(
+            education.entries, _generate_education_entry, template
+        ),
+    )
+
+
+def _generate_education_entry(edu: EducationEntry, template: LatexTemplate) -> str:
+    marks = template.render("marks", marks=escape_latex(edu.marks)) if edu.marks else ""
+    return template.render(
+        "education_entry",
+        institution=escape_latex(edu.institution),
+        location=escape_latex(edu.location),
+        degree=escape_latex(edu.degree),
+        marks=marks,
+        start_date=escape_latex(edu.start_date),
+        end_date=escape_latex(edu.end_date),
+    )
+
+
+def _generate_skills(skills: SkillsSection, template: LatexTemplate) -> str:
     if not skills.entries:
         return ""
 
-    items_latex = []
-    for entry in skills.entries:
-        items = ", ".join(escape_latex(item) for item in entry.items)
-        items_latex.append(
-            f"\\resumeItem{{\\textbf{{{escape_latex(entry.category)}}}: {items}}}"
-        )
+    return template.render(
+        "section_skills",
+        title=escape_latex(skills.section_title),
+        entries=_generate_entries(skills.entries, _generate_skill_category, template),
+    )
 
-    return f"""
-    \\section{{{escape_latex(skills.section_title)}}}
-    \\resumeSubHeadingListStart
-    \\resumeItemListStart
-    {chr(10).join(items_latex)}
-    \\resumeItemListEnd
-    \\resumeSubHeadingListEnd
-    """
 
+def _generate_skill_category(entry: SkillCategory, template: LatexTemplate) -> str:
+    separator = template.settings["list_separator"]
+    return template.render(
+        "skill_category",
+        category=escape_latex(entry.category),
+        items=separator.join(escape_latex_many(entry.items)),
+    )
 
-def _generate_experience(experience: ExperienceSection) -> str:
+
+def _generate_experience(experience: ExperienceSection, template: LatexTemplate) -> str:
     if not experience.entries:
         return ""
 
-    entries_latex = []
-    for exp in experience.entries:
-        accomplishments = "\n".join(
-            f"\\resumeItem{{{escape_latex(a)}}}" for a in exp.accomplishments
-        )
-        entries_latex.append(
-            f"""
-            \\resumeSubHeadingListStart
-            \\resumeProjectHeading
-            {{\\textbf{{{escape_latex(exp.title)}}}}}{{{escape_latex(exp.date)}}}
-            \\resumeItemListStart
-            {accomplishments}
-            \\resumeItemListEnd
-            \\resumeSubHeadingListEnd
-        """
-        )
+    return template.render(
+        "section_experience",
+        title=escape_latex(experience.section_title),
+        entries=_generate_entries(
+            experience.entries, _generate_experience_entry, template
+        ),
+    )
 
-    return f"""
-    \\section{{{escape_latex(experience.section_title)}}}
-    {"".join(entries_latex)}
-    """
 
+def _generate_experience_entry(exp: ExperienceEntry, template: LatexTemplate) -> str:
+    return template.render(
+        "experience_entry",
+        title=escape_latex(exp.title),
+        date=escape_latex(exp.date),
+        items=_generate_items(exp.accomplishments, template),
+    )
 
-def _generate_projects(projects: ProjectsSection) -> str:
+
+def _generate_projects(projects: ProjectsSection, template: LatexTemplate) -> str:
     if not projects.entries:
         return ""
 
-    entries_latex = []
-    for proj in projects.entries:
-        accomplishments = "\n".join(
-            f"\\resumeItem{{{escape_latex(a)}}}" for a in proj.accomplishments
-        )
-        url_part = ""
-        if proj.url:
-            url_part = (
-                f"\\href{{{escape_url(proj.url)}}}{{{escape_latex(proj.url_label)}}}"
-            )
+    return template.render(
+        "section_projects",
+        title=escape_latex(projects.section_title),
+        entries=_generate_entries(projects.entries, _generate_project_entry, template),
+    )
+
 
-        entries_latex.append(
-            f"""
-            \\resumeSubHeadingListStart
-            \\resumeProjectHeading
-            {{\\textbf{{{escape_latex(proj.title)}}}}}{{{url_part}}}
-            \\resumeItemListStart
-            {accomplishments}
-            \\resumeItemListEnd
-            \\resumeSubHeadingListEnd
-        """
+def _generate_project_entry(proj: ProjectEntry, template: LatexTemplate) -> str:
+    link = ""
+    if proj.url:
+        link = template.render(
+            "project_link", url=escape_url(proj.url), label=escape_latex(proj.url_label)
         )
 
-    return f"""
-    \\section{{{escape_latex(projects.section_title)}}}
-    {"".join(entries_latex)}
-    """
+    return template.render(
+        "project_entry",
+        title=escape_latex(proj.title),
+        link=link,
+        items=_generate_items(proj.accomplishments, template),
+    )
 
 
-def _generate_awards(awards: AwardsSection) -> str:
+def _generate_awards(awards: AwardsSection, template: LatexTemplate) -> str:
     if not awards.entries:
         return ""
 
-    items_latex = []
-    for award in awards.entries:
-        description = escape_latex(award.description)
-        url_part = ""
-        if award.url:
-            label = escape_latex(award.url_label or "Link")
-            url_part = (
-                f"\\hfill \\href{{{escape_url(award.url)}}}{{\\underline{{{label}}}}}"
-            )
-        items_latex.append(f"\\resumeItem{{{description}{url_part}}}")
+    return template.render(
+        "section_awards",
+        title=escape_latex(awards.section_title),
+        entries=_generate_entries(awards.entries, _generate_award_entry, template),
+    )
 
-    return f"""
-    \\section{{{escape_latex(awards.section_title)}}}
-    \\resumeSubHeadingListStart
-    {chr(10).join(items_latex)}
-    \\resumeSubHeadingListEnd
-    """
+
+def _generate_award_entry(award: AwardEntry, template: LatexTemplate) -> str:
+    link = ""
+    if award.url:
+        link = template.render(
+            "award_link",
+            url=escape_url(award.url),
+            label=escape_latex(award.url_label or "Link"),
+        )
+    return template.render(
+        "award_entry", description=escape_latex(award.description), link=link
+    )
 
 
-def _generate_custom_section(custom: CustomSection) -> str:
+def _generate_custom_section(custom: CustomSection, template: LatexTemplate) -> str:
     if not custom.entries:
         return ""
 
-    entries_latex = []
-    for entry in custom.entries:
-        parts = []
-
-        if entry.title:
-            title_part = f"\\textbf{{{escape_latex(entry.title)}}}"
-            if entry.url and entry.url_label:
-                title_part += f" \\href{{{escape_url(entry.url)}}}{{{escape_latex(entry.url_label)}}}"
-            parts.append(title_part)
+    return template.render(
+        "section_custom",
+        title=escape_latex(custom.section_title),
+        entries=_generate_entries(custom.entries, _generate_custom_entry, template),
+    )
 
-        if entry.subtitle:
-            parts.append(escape_latex(entry.subtitle))
 
-        header = " -- ".join(parts) if parts else ""
-        date_part = escape_latex(entry.date) if entry.date else ""
+def _generate_custom_entry(entry: CustomEntry, template: LatexTemplate) -> str:
+    parts = []
 
-        bullets = (
-            "\n".join(f"\\resumeItem{{{escape_latex(b)}}}" for b in entry.bullets)
-            if entry.bullets
-            else ""
-        )
-
-        if bullets:
-            entries_latex.append(
-                f"""
-                \\resumeSubHeadingListStart
-                \\resumeProjectHeading{{{header}}}{{{date_part}}}
-                \\resumeItemListStart
-                {bullets}
-                \\resumeItemListEnd
-                \\resumeSubHeadingListEnd
-            """
-            )
-        elif header:
-            entries_latex.append(
-                f"""
-                \\resumeSubHeadingListStart
-                \\resumeProjectHeading{{{header}}}{{{date_part}}}
-                \\resumeSubHeadingListEnd
-            """
+    if entry.title:
+        title_part = template.render("custom_title", title=escape_latex(entry.title))
+        if entry.url and entry.url_label:
+            title_part += template.render(
+                "custom_title_link",
+                url=escape_url(entry.url),
+                label=escape_latex(entry.url_label),
             )
+        parts.append(title_part)
 
-    return f"""
-    \\section{{{escape_latex(custom.section_title)}}}
-    {"".join(entries_latex)}
-    """
+    if entry.subtitle:
+        parts.append(escape_latex(entry.subtitle))
 
+    header = template.settings["header_separator"].join(parts)
+    date_part = escape_latex(entry.date) if entry.date else ""
 
-def _build_document(
-    heading: PersonalInfo, contact_line: str, section_content: str
-) -> str:
-    name = escape_latex(heading.name)
-    location = escape_latex(heading.location) if heading.location else ""
-
-    return f"""\\documentclass[letterpaper,11pt]{{article}}
-
-\\usepackage{{latexsym}}
-\\usepackage[empty]{{fullpage}}
-\\usepackage{{titlesec}}
-\\usepackage{{marvosym}}
-\\usepackage[usenames,dvipsnames]{{color}}
-\\usepackage{{verbatim}}
-\\usepackage{{enumitem}}
-\\usepackage[hidelinks]{{hyperref}}
-\\usepackage{{fancyhdr}}
-\\usepackage[english]{{babel}}
-\\usepackage{{tabularx}}
-\\input{{glyphtounicode}}
-
-\\pagestyle{{fancy}}
-\\fancyhf{{}}
-\\fancyfoot{{}}
-\\renewcommand{{\\headrulewidth}}{{0pt}}
-\\renewcommand{{\\footrulewidth}}{{0pt}}
-
-% Adjust margins
-\\addtolength{{\\oddsidemargin}}{{-0.5in}}
-\\addtolength{{\\evensidemargin}}{{-0.5in}}
-\\addtolength{{\\textwidth}}{{1in}}
-\\addtolength{{\\topmargin}}{{-.5in}}
-\\addtolength{{\\textheight}}{{1.0in}}
-
-\\urlstyle{{same}}
-
-\\raggedbottom
-\\raggedright
-\\setlength{{\\tabcolsep}}{{0in}}
-
-% Sections formatting
-\\titleformat{{\\section}}{{
-  \\vspace{{-5pt}}\\scshape\\raggedright\\large
-}}{{}}{{0em}}{{}}[\\color{{black}}\\titlerule \\vspace{{-5pt}}]
-
-% Ensure that generated pdf is machine readable/ATS parsable
-\\pdfgentounicode=1
-
-%-------------------------
-% Custom commands
-\\newcommand{{\\resumeItem}}[1]{{
-  \\item\\small{{
-    {{#1 \\vspace{{-2pt}}}}
-  }}
-}}
-
-\\newcommand{{\\resumeSubheading}}[4]{{
-  \\vspace{{2pt}}\\item
-    \\begin{{tabular*}}{{0.97\\textwidth}}[t]{{l@{{\\extracolsep{{\\fill}}}}r}}
-      \\textbf{{#1}} & #2 \\\\
-      \\textit{{\\small#3}} & \\textit{{\\small #4}} \\\\
-    \\end{{tabular*}}\\vspace{{-7pt}}
-}}
-
-\\newcommand{{\\resumeSubSubheading}}[2]{{
-    \\item
-    \\begin{{tabular*}}{{0.97\\textwidth}}{{l@{{\\extracolsep{{\\fill}}}}r}}
-      \\textit{{\\small#1}} & \\textit{{\\small #2}} \\\\
-    \\end{{tabular*}}\\vspace{{-5pt}}
-}}
-
-\\newcommand{{\\resumeProjectHeading}}[2]{{
-    \\item
-    \\begin{{tabular*}}{{0.97\\textwidth}}{{l@{{\\extracolsep{{\\fill}}}}r}}
-      \\small#1 & #2 \\\\
-    \\end{{tabular*}}\\vspace{{-10pt}}
-}}
-
-\\newcommand{{\\resumeSubItem}}[1]{{\\resumeItem{{#1}}\\vspace{{-1pt}}}}
-
-\\renewcommand\\labelitemii{{$\\vcenter{{\\hbox{{\\tiny$\\bullet$}}}}$}}
-
-\\newcommand{{\\resumeSubHeadingListStart}}{{\\begin{{itemize}}[leftmargin=0.15in, label={{}}]}}
-\\newcommand{{\\resumeSubHeadingListEnd}}{{\\end{{itemize}}}}
-\\newcommand{{\\resumeItemListStart}}{{\\begin{{itemize}}}}
-\\newcommand{{\\resumeItemListEnd}}{{\\end{{itemize}}\\vspace{{-5pt}}}}
-
-%-------------------------------------------
-%%%%%%  RESUME STARTS HERE  %%%%%%%%%%%%%%%%%%%%%%%%%%%%
-
-\\begin{{document}}
-
-%----------HEADING----------
-\\begin{{center}}
-    \\textbf{{\\Huge \\scshape {name}}} \\\\
-    \\vspace{{1pt}}
-    {contact_line + " \\\\" if contact_line else ""}
-    {f"\\small {location}" if location else ""}
-\\end{{center}}
-
-{section_content}
-
-\\end{{document}}
-"""
+    if entry.bullets:
+        return template.render(
+            "custom_entry",
+            header=header,
+            date=date_part,
+            items=_generate_items(entry.bullets, template),
+        )
+    elif header:
+        return template.render("custom_heading_entry", header=header, date=date_part)
+    return ""
@@ -0,0 +1,174 @@
+import json
+import os
+import re
+from typing import Iterable, Iterator, Optional
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+DEFAULT_TEMPLATE = "classic"
+
+LAYOUT_RE = re.compile(r"^%% layout: (\w+)\s*$", re.MULTILINE)
+SETTING_RE = re.compile(r"^%% (\w+): (.*)$", re.MULTILINE)
+PLACEHOLDER_RE = re.compile(r"<<(\w+)>>")
+
+# Every template must define these layouts, using only the listed fields
+LAYOUT_FIELDS: dict[str, set[str]] = {
+    "preamble": set(),
+    "document": {"heading", "sections"},
+    "heading": {"name", "contact_line", "location_line"},
+    "contact_line": {"contacts"},
+    "location_line": {"location"},
+    "email": {"email"},
+    "social": {"url", "name"},
+    "item": {"text"},
+    "section_education": {"title", "entries"},
+    "education_entry": {
+        "institution",
+        "location",
+        "degree",
+        "marks",
+        "start_date",
+        "end_date",
+    },
+    "marks": {"marks"},
+    "section_skills": {"title", "entries"},
+    "skill_category": {"category", "items"},
+    "section_experience": {"title", "entries"},
+    "experience_entry": {"title", "date", "items"},
+    "section_projects": {"title", "entries"},
+    "project_entry": {"title", "link", "items"},
+    "project_link": {"url", "label"},
+    "section_awards": {"title", "entries"},
+    "award_entry": {"description", "link"},
+    "award_link": {"url", "label"},
+    "section_custom": {"title", "entries"},
+    "custom_entry": {"header", "date", "items"},
+    "custom_heading_entry": {"header", "date"},
+    "custom_title": {"title"},
+    "custom_title_link": {"url", "label"},
+}
+DEFAULT_SETTINGS = {
+    "contact_separator": " $|$ ",
+    "list_separator": ", ",
+    "header_separator": " -- ",
+}
+
+
+class UnknownTemplate(Exception):
+    pass
+
+
+class CompiledLayout:
+    """A layout split once into literal text and the fields between it."""
+
+    def __init__(self, text: str):
+        pieces = PLACEHOLDER_RE.split(text)
+        self.literals = pieces[0::2]
+        self.fields = pieces[1::2]
+
+    def render(self, values: dict[str, str]) -> str:
+        parts = [self.literals[0]]
+        for name, literal in zip(self.fields, self.literals[1:]):
+            parts.append(values[name])
+            parts.append(literal)
+        return "".join(parts)
+
+
+class LatexTemplate:
+    """
+    One resume layout, parsed from a .tex file in the templates directory.
+
+    The file starts with "%% key: value" settings and is followed by
+    fragments, each introduced by a "%% layout: <name>" line. Fragment text
+    uses <<field>> placeholders for the escaped resume data. The preamble
+    takes no fields, so it is shared by every document using the template
+    and can be precompiled into a format.
+    """
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+
+        split = LAYOUT_RE.split(source)
+        header, bodies = split[0], split[1:]
+        settings = {
+            key: json.loads(value) if value.startswith('"') else value.strip()
+            for key, value in SETTING_RE.findall(header)
+        }
+        self.title: str = settings.pop("title", name.title())
+        self.settings = {**DEFAULT_SETTINGS, **settings}
+
+        self.layouts: dict[str, CompiledLayout] = {}
+        for layout_name, body in zip(bodies[0::2], bodies[1::2]):
+            self.layouts[layout_name] = CompiledLayout(body.strip("\n"))
+        self._validate()
+
+        self.preamble = self.layouts["preamble"].literals[0] + "\n\n"
+
+    def render(self, layout: str, **values: str) -> str:
+        return self.layouts[layout].render(values)
+
+    def iter_document(self, heading: str, sections: Iterable[str]) -> Iterator[str]:
+        """
+        Yield the full document piece by piece, pulling each section from
+        sections only when it is reached, so it can be written straight to a
+        file or response instead of being assembled first.
+        """
+        yield self.preamble
+        layout = self.layouts["document"]
+        yield layout.literals[0]
+        for name, literal in zip(layout.fields, layout.literals[1:]):
+            if name == "heading":
+                yield heading
+            else:
+                for index, section in enumerate(sections):
+                    if index:
+                        yield "\n\n"
+                    yield section
+            yield literal
+        yield "\n"
+
+    def _validate(self) -> None:
+        missing = LAYOUT_FIELDS.keys() - self.layouts.keys()
+        if missing:
+            raise Exception(
+                f"Template {self.name} is missing layouts: {', '.join(sorted(missing))}"
+            )
+        for layout_name, layout in self.layouts.items():
+            allowed = LAYOUT_FIELDS.get(layout_name)
+            if allowed is None:
+                raise Exception(
+                    f"Template {self.name} has unknown layout {layout_name}"
+                )
+            unknown = set(layout.fields) - allowed
+            if unknown:
+                raise Exception(
+                    f"Template {self.name} layout {layout_name} uses unknown fields: "
+                    f"{', '.join(sorted(unknown))}"
+                )
+
+
+class TemplateRegistry:
+    """All templates, loaded and compiled once when the module is imported."""
+
+    def __init__(self, template_dir: str):
+        self._templates: dict[str, LatexTemplate] = {}
+        for filename in sorted(os.listdir(template_dir)):
+            name, extension = os.path.splitext(filename)
+            if extension != ".tex":
+                continue
+            with open(os.path.join(template_dir, filename), encoding="utf-8") as f:
+                self._templates[name] = LatexTemplate(name, f.read())
+
+        if DEFAULT_TEMPLATE not in self._templates:
+            raise Exception(f"Default template {DEFAULT_TEMPLATE} not found")
+
+    def get(self, name: Optional[str]) -> LatexTemplate:
+        template = self._templates.get(name or DEFAULT_TEMPLATE)
+        if template is None:
+            raise UnknownTemplate(f"Unknown template: {name}")
+        return template
+
+    def all(self) -> list[LatexTemplate]:
+        return list(self._templates.values())
+
+
+templates = TemplateRegistry(TEMPLATE_DIR)
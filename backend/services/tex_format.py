@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from ..config import get_settings
+from .template_registry import templates
+
+settings = get_settings()
+FORMAT_DIR = settings.format_dir
+FORMAT_TIMEOUT = settings.latex_timeout
+KNOWN_PREAMBLES = tuple(template.preamble for template in templates.all())
+
+os.makedirs(FORMAT_DIR, exist_ok=True)
+
+_tex_fingerprint: Optional[str] = None
+_building: dict[str, asyncio.Task] = {}
+_failed: set[str] = set()
+
+
+async def find_format(latex_text: str) -> Optional[str]:
+    """
+    Return the name of a ready precompiled format for this document.
+
+    Only documents starting with one of the known template preambles can
+    use a format. A missing format is built in the background and the
+    caller compiles without it in the meantime.
+    """
+    if not settings.preamble_format_enabled:
+        return None
+
+    for preamble in KNOWN_PREAMBLES:
+        if latex_text.startswith(preamble):
+            break
+    else:
+        return None
+
+    name = await _format_name(preamble)
+    if os.path.exists(_format_path(name)):
+        return name
+
+    if name not in _failed and name not in _building:
+        _building[name] = asyncio.create_task(_build_format(name, preamble))
+    return None
+
+
+async def build_formats() -> None:
+    if not settings.preamble_format_enabled:
+        return
+
+    current = set()
+    for preamble in KNOWN_PREAMBLES:
+        name = await _format_name(preamble)
+        current.add(f"{name}.fmt")
+        if not os.path.exists(_format_path(name)):
+            await _build_format(name, preamble)
+
+    # Drop formats left behind by older preambles or TeX installations
+    for filename in os.listdir(FORMAT_DIR):
+        if filename.startswith("resume-") and filename not in current:
+            try:
+                os.remove(os.path.join(FORMAT_DIR, filename))
+            except FileNotFoundError:
+                pass
+
+
+def discard_format(name: str) -> None:
+    # A format that fails where the plain engine succeeds is not rebuilt
+    _failed.add(name)
+    try:
+        os.remove(_format_path(name))
+    except FileNotFoundError:
+        pass
+
+
+def format_env() -> dict[str, str]:
+    # Trailing separator keeps the default kpathsea search path
+    return {**os.environ, "TEXFORMATS": f"{FORMAT_DIR}{os.pathsep}"}
+
+
+async def _format_name(preamble: str) -> str:
+    digest = hashlib.sha256()
+    digest.update((await _get_tex_fingerprint()).encode("utf-8"))
+    digest.update(preamble.encode("utf-8"))
+    return f"resume-{digest.hexdigest()[:16]}"
+
+
+def _format_path(name: str) -> str:
+    return os.path.join(FORMAT_DIR, f"{name}.fmt")
+
+
+async def _get_tex_fingerprint() -> str:
+    global _tex_fingerprint
+    if _tex_fingerprint is not None:
+        return _tex_fingerprint
+
+    parts = []
+    for command in (["pdflatex", "--version"], ["kpsewhich", "pdflatex.fmt"]):
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=10)
+            parts.append(stdout.decode("utf-8", errors="ignore").strip())
+        except (FileNotFoundError, asyncio.TimeoutError):
+            parts.append("")
+
+    # The base format changes whenever TeX Live or its packages are updated
+    base_format = parts[-1]
+    if base_format and os.path.exists(base_format):
+        stat = os.stat(base_format)
+        parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+
+    _tex_fingerprint = "\n".join(parts)
+    return _tex_fingerprint
+
+
+async def _build_format(name: str, preamble: str) -> Optional[str]:
+    build_dir = tempfile.mkdtemp(dir=FORMAT_DIR, prefix=".build-")
+
+    try:
+        with open(os.path.join(build_dir, "preamble.tex"), "w", encoding="utf-8") as f:
+            f.write(preamble)
+            f.write("\\begin{document}\n\\end{document}\n")
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "pdflatex",
+                "-ini",
+                "-interaction=nonstopmode",
+                "-halt-on-error",
+                f"-jobname={name}",
+                "&pdflatex",
+                "mylatexformat.ltx",
+                "preamble.tex",
+                cwd=build_dir,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            await asyncio.wait_for(process.wait(), timeout=FORMAT_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            _failed.add(name)
+            return None
+        except FileNotFoundError:
+            _failed.add(name)
+            return None
+
+        built_path = os.path.join(build_dir, f"{name}.fmt")
+        if process.returncode != 0 or not os.path.exists(built_path):
+            print(f"Failed to build preamble format {name}")
+            _failed.add(name)
+            return None
+
+        os.replace(built_path, _format_path(name))
+        print(f"Built preamble format {name}")
+        return _format_path(name)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        _building.pop(name, None)
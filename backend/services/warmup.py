@@ -0,0 +1,30 @@
+import time
+
+from ..config import get_settings
+from ..models.resume import get_default_resume_data
+from .latex_compiler import warm_up_toolchain
+from .template_engine import generate_latex
+from .tex_format import build_formats
+
+settings = get_settings()
+
+
+async def warm_up() -> None:
+    """
+    Build the preamble formats and run one compile of the default resume.
+
+    Errors are logged and swallowed: a process whose warm-up failed is
+    still able to serve, it just pays the cold start on the first request.
+    """
+    await build_formats()
+    if not settings.warmup_enabled:
+        return
+
+    started = time.perf_counter()
+    try:
+        latex_text = generate_latex(get_default_resume_data())
+        await warm_up_toolchain(latex_text)
+    except Exception as e:
+        print(f"Warm-up compile failed: {e}")
+        return
+    print(f"Warm-up compile finished in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+OVERFLOW_PREFIX = "overflow-"
+
+
+class WorkDirPool:
+    """
+    Reusable compile directories under a per-process root.
+
+    Directories are emptied and handed back instead of being created and
+    removed for every job. Each process owns root/<pid>, which lets the
+    janitor tell directories of live workers from those left behind by
+    crashed ones.
+    """
+
+    def __init__(self, root: str, size: int):
+        self.root = root
+        self.size = size
+        self.owner_dir = os.path.join(root, str(os.getpid()))
+        self._free: list[str] = []
+        self._created = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(root, exist_ok=True)
+        remove_orphaned_work_dirs(root)
+        # A previous process with our pid cannot still be using this
+        shutil.rmtree(self.owner_dir, ignore_errors=True)
+        os.makedirs(self.owner_dir)
+
+    def acquire(self) -> str:
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            if self._created < self.size:
+                path = os.path.join(self.owner_dir, f"w{self._created}")
+                self._created += 1
+                os.makedirs(path)
+                return path
+
+        return tempfile.mkdtemp(dir=self.owner_dir, prefix=OVERFLOW_PREFIX)
+
+    def release(self, path: str) -> None:
+        if os.path.basename(path).startswith(OVERFLOW_PREFIX):
+            shutil.rmtree(path, ignore_errors=True)
+            return
+
+        try:
+            _empty_dir(path)
+        except OSError:
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path, exist_ok=True)
+
+        with self._lock:
+            self._free.append(path)
+
+    @contextmanager
+    def work_dir(self) -> Iterator[str]:
+        path = self.acquire()
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+
+def resolve_root(preferred: str, fallback: str) -> str:
+    # Use the RAM-backed location only when its parent mount actually exists
+    parent = os.path.dirname(preferred.rstrip(os.sep)) or os.sep
+    if os.path.isdir(parent) and os.access(parent, os.W_OK):
+        return preferred
+    return fallback
+
+
+def remove_orphaned_work_dirs(root: str) -> int:
+    removed = 0
+    with os.scandir(root) as it:
+        for entry in it:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            if entry.name.isdigit() and _process_alive(int(entry.name)):
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+
+    if removed:
+        print(f"Removed {removed} orphaned compile directories from {root}")
+    return removed
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _empty_dir(path: str) -> None:
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
@@ -0,0 +1,75 @@
+"""
+Standalone compile worker.
+
+Takes compile jobs from the MongoDB queue and writes the results back, so
+TeX and Ghostscript run outside the API processes. Start one or more with:
+
+    python -m backend.worker
+"""
+
+import asyncio
+import os
+import signal
+import socket
+
+from .config import get_settings
+from .database import close_database_connection, connect_to_database
+from .services import compile_queue
+from .services.latex_compiler import finish_job
+from .services.warmup import warm_up
+
+settings = get_settings()
+IDLE_POLL_SECONDS = 0.2
+
+
+async def main() -> None:
+    await connect_to_database()
+    await compile_queue.ensure_indexes()
+
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    # Cold jobs are left to workers that are already warm
+    await warm_up()
+    tasks = [
+        asyncio.create_task(_work(worker_id, stop))
+        for _ in range(max(1, settings.compile_max_jobs))
+    ]
+    tasks.append(asyncio.create_task(_requeue_stale(stop)))
+    print(f"Compile worker {worker_id} started with {len(tasks) - 1} slots")
+
+    await stop.wait()
+    # Jobs already claimed are finished before exiting
+    await asyncio.gather(*tasks)
+    await close_database_connection()
+
+
+async def _work(worker_id: str, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        job = await compile_queue.claim(worker_id)
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), IDLE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await finish_job(job["_id"], job)
+
+
+async def _requeue_stale(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        requeued = await compile_queue.requeue_stale(compile_queue.stale_after())
+        if requeued:
+            print(f"Requeued {requeued} compile jobs from stopped workers")
+        try:
+            await asyncio.wait_for(stop.wait(), compile_queue.STALE_CHECK_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
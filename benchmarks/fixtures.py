@@ -0,0 +1,210 @@
+"""
+Synthetic resumes for the benchmarks, from an empty resume to pathological
+sizes. Every fixture is deterministic so results stay comparable to the
+stored baseline.
+"""
+
+from backend.models.sections import (
+    AwardEntry,
+    AwardsSection,
+    CustomEntry,
+    CustomSection,
+    EducationEntry,
+    EducationSection,
+    ExperienceEntry,
+    ExperienceSection,
+    PersonalInfo,
+    ProjectEntry,
+    ProjectsSection,
+    ResumeData,
+    SkillCategory,
+    SkillsSection,
+    Social,
+)
+
+BULLET = (
+    "Cut p99 latency of the #1 search API by 45% & saved $12k/month by "
+    "rewriting the cache_layer in C++ with {lock-free} queues"
+)
+UNICODE_BULLET = (
+    "Led the Zürich–東京 rollout for 2,000 users: Ærøskøbing, São Paulo, "
+    "Kraków, Δελφοί and Москва, shipping ✓ on time 🚀 with „quoted“ notes"
+)
+# Every special character, several times over
+SPECIAL_TEXT = "\\_{}$%#&^~`\"' % \\input " * 8
+
+
+def _heading() -> PersonalInfo:
+    return PersonalInfo(
+        name="Jordan Smith",
+        phone="+1 (555) 010-2030",
+        email="jordan_smith@example.com",
+        location="San Francisco, CA",
+        socials=[
+            Social(name="GitHub", url="https://github.com/jordan_smith"),
+            Social(name="LinkedIn", url="https://linkedin.com/in/jordan-smith"),
+        ],
+    )
+
+
+def _education(count: int) -> EducationSection:
+    return EducationSection(
+        entries=[
+            EducationEntry(
+                id=f"edu-{i}",
+                institution=f"University of Example {i}",
+                location="Boston, MA",
+                degree="B.S. in Computer Science & Mathematics",
+                start_date="Sep. 2016",
+                end_date="May 2020",
+                marks="GPA: 3.9/4.0",
+            )
+            for i in range(count)
+        ]
+    )
+
+
+def _skills(categories: int, items: int) -> SkillsSection:
+    return SkillsSection(
+        entries=[
+            SkillCategory(
+                category=f"Category {i}",
+                items=[f"Skill_{i}_{j} (C#/F#)" for j in range(items)],
+            )
+            for i in range(categories)
+        ]
+    )
+
+
+def _experience(entries: int, bullets: int, bullet: str = BULLET) -> ExperienceSection:
+    return ExperienceSection(
+        entries=[
+            ExperienceEntry(
+                id=f"exp-{i}",
+                title=f"Senior Engineer {i} -- Example Corp",
+                date="Jan 2020 -- Present",
+                accomplishments=[f"{bullet} ({j})" for j in range(bullets)],
+            )
+            for i in range(entries)
+        ]
+    )
+
+
+def _projects(entries: int, bullets: int) -> ProjectsSection:
+    return ProjectsSection(
+        entries=[
+            ProjectEntry(
+                id=f"proj-{i}",
+                title=f"Project_{i}",
+                url=f"https://example.com/projects/{i}?tab=code&ref=cv#top",
+                url_label="Source",
+                accomplishments=[f"{BULLET} ({j})" for j in range(bullets)],
+            )
+            for i in range(entries)
+        ]
+    )
+
+
+def _awards(count: int) -> AwardsSection:
+    return AwardsSection(
+        entries=[
+            AwardEntry(
+                id=f"award-{i}",
+                description=f"Top 1% of 10,000 entrants in Contest #{i}",
+                url=f"https://example.com/awards/{i}",
+                url_label="Certificate",
+            )
+            for i in range(count)
+        ]
+    )
+
+
+def _custom_sections(sections: int, entries: int, bullets: int) -> list:
+    return [
+        CustomSection(
+            section_title=f"Custom Section {i}",
+            section_type=f"custom-{i}",
+            entries=[
+                CustomEntry(
+                    id=f"custom-{i}-{j}",
+                    title=f"Entry {j}",
+                    subtitle="Example Org & Partners",
+                    date="2021 -- 2023",
+                    url=f"https://example.com/{i}/{j}",
+                    url_label="Details",
+                    bullets=[f"{BULLET} ({k})" for k in range(bullets)],
+                )
+                for j in range(entries)
+            ],
+        )
+        for i in range(sections)
+    ]
+
+
+def minimal_resume() -> ResumeData:
+    return ResumeData(heading=PersonalInfo(name="Jordan Smith"))
+
+
+def typical_resume() -> ResumeData:
+    """One page: a couple of jobs and projects with a handful of bullets."""
+    return ResumeData(
+        heading=_heading(),
+        education=_education(2),
+        skills=_skills(4, 8),
+        experience=_experience(3, 4),
+        projects=_projects(3, 3),
+        honors_and_awards=_awards(3),
+        section_order=[
+            "education",
+            "skills",
+            "experience",
+            "projects",
+            "honors_and_awards",
+        ],
+    )
+
+
+def large_resume() -> ResumeData:
+    """Hundreds of bullets across experience and projects."""
+    return ResumeData(
+        heading=_heading(),
+        education=_education(4),
+        skills=_skills(12, 30),
+        experience=_experience(20, 20),
+        projects=_projects(20, 10),
+        honors_and_awards=_awards(30),
+        section_order=[
+            "education",
+            "skills",
+            "experience",
+            "projects",
+            "honors_and_awards",
+        ],
+    )
+
+
+def unicode_resume() -> ResumeData:
+    """Long non-ASCII bullets, plus bullets made of special characters."""
+    data = typical_resume()
+    data.experience = _experience(6, 10, bullet=UNICODE_BULLET * 4)
+    data.projects.entries[0].accomplishments = [SPECIAL_TEXT] * 10
+    return data
+
+
+def custom_resume() -> ResumeData:
+    """Many user-defined sections."""
+    custom_sections = _custom_sections(40, 5, 3)
+    return ResumeData(
+        heading=_heading(),
+        custom_sections=custom_sections,
+        section_order=[section.section_type for section in custom_sections],
+    )
+
+
+FIXTURES = {
+    "minimal": minimal_resume,
+    "typical": typical_resume,
+    "large": large_resume,
+    "unicode": unicode_resume,
+    "custom": custom_resume,
+}
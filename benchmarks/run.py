@@ -0,0 +1,333 @@
+"""
+Microbenchmarks for LaTeX generation and escaping.
+
+Run from the repository root:
+
+    python -m benchmarks.run                 # compare against baseline.json
+    python -m benchmarks.run --update        # record a new baseline
+    python -m benchmarks.run -k generate     # only matching benchmarks
+
+Each benchmark reports operations per second (best of several timed runs)
+and the peak memory allocated by one call, measured with tracemalloc. The
+run fails when a benchmark is slower, or allocates more, than its baseline
+by more than the threshold.
+
+The benchmarks are run by hand, not in CI. Compare against a baseline
+recorded on the same machine and Python version.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from backend.services import template_engine
+from backend.services.escape_latex import escape_latex, escape_latex_many, escape_url
+from backend.services.template_registry import templates
+
+from .fixtures import BULLET, FIXTURES, SPECIAL_TEXT, UNICODE_BULLET
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+# Allocation differences below this are noise, not regressions
+ALLOCATION_SLACK = 1024
+MIN_RUN_SECONDS = 0.1
+# A benchmark over the threshold is measured again before it counts as a
+# regression, since a busy machine easily costs a single run 30%
+CONFIRM_RUNS = 2
+# A new baseline keeps the median of several measurements, so one lucky
+# run does not set a bar the next runs cannot reach
+UPDATE_RUNS = 3
+
+
+class Benchmark:
+    def __init__(self, name: str, run: Callable[[], object], cold: bool = True):
+        self.name = name
+        self.run = run
+        # Cold benchmarks run without the escape and fragment memos
+        self.cold = cold
+
+
+@contextmanager
+def _caches(enabled: bool) -> Iterator[None]:
+    fragments = template_engine.fragments
+    max_entries = fragments.max_entries
+    if not enabled:
+        fragments.max_entries = 0
+    escape_latex.cache_clear()
+    try:
+        yield
+    finally:
+        fragments.max_entries = max_entries
+
+
+class _Discard(io.TextIOBase):
+    """A text sink that drops what it is given, so only the writer is measured."""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        return len(text)
+
+
+def _uncached(run: Callable[[], object]) -> Callable[[], object]:
+    def run_cold() -> object:
+        escape_latex.cache_clear()
+        return run()
+
+    return run_cold
+
+
+def _benchmarks() -> List[Benchmark]:
+    template = templates.get(None)
+    resumes = {name: build() for name, build in FIXTURES.items()}
+    large = resumes["large"]
+    custom = resumes["custom"]
+    bullets = [f"{BULLET} ({i})" for i in range(200)]
+    long_unicode = UNICODE_BULLET * 20
+    url = "https://example.com/a_path/to?q=50%25&tab=code#section_2"
+
+    benchmarks = [
+        Benchmark("escape_latex/short", _uncached(lambda: escape_latex("May 2020"))),
+        Benchmark("escape_latex/bullet", _uncached(lambda: escape_latex(BULLET))),
+        Benchmark(
+            "escape_latex/unicode_long",
+            _uncached(lambda: escape_latex(long_unicode)),
+        ),
+        Benchmark(
+            "escape_latex/all_specials",
+            _uncached(lambda: escape_latex(SPECIAL_TEXT)),
+        ),
+        Benchmark("escape_latex/memoized", lambda: escape_latex(BULLET), cold=False),
+        Benchmark(
+            "escape_latex_many/200_bullets",
+            _uncached(lambda: escape_latex_many(bullets)),
+        ),
+        Benchmark("escape_url/query", lambda: escape_url(url)),
+    ]
+
+    for name, resume in resumes.items():
+        benchmarks.append(
+            Benchmark(
+                f"generate_latex/{name}",
+                _uncached(lambda resume=resume: template_engine.generate_latex(resume)),
+            )
+        )
+    benchmarks.append(
+        Benchmark(
+            "generate_latex/typical_memoized",
+            lambda: template_engine.generate_latex(resumes["typical"]),
+            cold=False,
+        )
+    )
+    benchmarks.append(
+        Benchmark(
+            "write_latex/large",
+            _uncached(lambda: template_engine.write_latex(large, _Discard())),
+        )
+    )
+    benchmarks.append(
+        Benchmark(
+            "iter_latex/large",
+            _uncached(lambda: sum(map(len, template_engine.iter_latex(large)))),
+        )
+    )
+
+    helpers = [
+        ("_generate_heading/typical", template_engine._generate_heading, large.heading),
+        (
+            "_generate_education/large",
+            template_engine._generate_education,
+            large.education,
+        ),
+        ("_generate_skills/large", template_engine._generate_skills, large.skills),
+        (
+            "_generate_experience/large",
+            template_engine._generate_experience,
+            large.experience,
+        ),
+        (
+            "_generate_projects/large",
+            template_engine._generate_projects,
+            large.projects,
+        ),
+        (
+            "_generate_awards/large",
+            template_engine._generate_awards,
+            large.honors_and_awards,
+        ),
+        (
+            "_generate_custom_section/custom",
+            template_engine._generate_custom_section,
+            custom.custom_sections[0],
+        ),
+    ]
+    for name, generate, model in helpers:
+        benchmarks.append(
+            Benchmark(
+                name,
+                _uncached(
+                    lambda generate=generate, model=model: generate(model, template)
+                ),
+            )
+        )
+    return benchmarks
+
+
+def measure(benchmark: Benchmark, repeat: int) -> Dict[str, float]:
+    with _caches(enabled=not benchmark.cold):
+        # Warm up, and fill the memos for the memoized benchmarks
+        benchmark.run()
+
+        timer = timeit.Timer(benchmark.run)
+        number = 1
+        while timer.timeit(number) < MIN_RUN_SECONDS:
+            number *= 2
+        best = min(timer.repeat(repeat=repeat, number=number))
+
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            benchmark.run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {"ops_per_sec": round(number / best, 1), "peak_bytes": peak - start}
+
+
+def _regressions(
+    result: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> List[str]:
+    problems = []
+    ops_floor = baseline["ops_per_sec"] * (1 - threshold)
+    if result["ops_per_sec"] < ops_floor:
+        problems.append(
+            f"{result['ops_per_sec']:,.0f} ops/s < {baseline['ops_per_sec']:,.0f}"
+        )
+    bytes_ceiling = baseline["peak_bytes"] * (1 + threshold) + ALLOCATION_SLACK
+    if result["peak_bytes"] > bytes_ceiling:
+        problems.append(
+            f"{result['peak_bytes']:,} B peak > {baseline['peak_bytes']:,} B"
+        )
+    return problems
+
+
+def _environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+    }
+
+
+def _load_baseline() -> Optional[dict]:
+    if not os.path.exists(BASELINE_PATH):
+        return None
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "-k", dest="pattern", default="", help="only run benchmarks containing this"
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="write the results as the new baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.environ.get("BENCHMARK_THRESHOLD", DEFAULT_THRESHOLD)),
+        help="allowed regression as a fraction (default %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="timed runs per benchmark"
+    )
+    args = parser.parse_args(argv)
+
+    baseline = _load_baseline()
+    recorded = baseline["benchmarks"] if baseline else {}
+    if baseline and not args.update and baseline["environment"] != _environment():
+        print(
+            f"Warning: baseline was recorded on {baseline['environment']}, "
+            f"this is {_environment()}",
+            file=sys.stderr,
+        )
+
+    results = {}
+    failed = []
+    print(f"{'benchmark':<36} {'ops/s':>12} {'peak KiB':>10} {'vs baseline':>12}")
+    for benchmark in _benchmarks():
+        if args.pattern not in benchmark.name:
+            continue
+        if args.update:
+            runs = [measure(benchmark, args.repeat) for _ in range(UPDATE_RUNS)]
+            result = {
+                "ops_per_sec": statistics.median(run["ops_per_sec"] for run in runs),
+                "peak_bytes": min(run["peak_bytes"] for run in runs),
+            }
+        else:
+            result = measure(benchmark, args.repeat)
+        results[benchmark.name] = result
+
+        previous = recorded.get(benchmark.name)
+        change = ""
+        problems = []
+        if previous is not None and not args.update:
+            problems = _regressions(result, previous, args.threshold)
+            for _ in range(CONFIRM_RUNS if problems else 0):
+                retry = measure(benchmark, args.repeat)
+                result["ops_per_sec"] = max(result["ops_per_sec"], retry["ops_per_sec"])
+                result["peak_bytes"] = min(result["peak_bytes"], retry["peak_bytes"])
+                problems = _regressions(result, previous, args.threshold)
+                if not problems:
+                    break
+            change = f"{result['ops_per_sec'] / previous['ops_per_sec'] - 1:+.1%}"
+            if problems:
+                failed.append((benchmark.name, problems))
+        print(
+            f"{benchmark.name:<36} {result['ops_per_sec']:>12,.0f} "
+            f"{result['peak_bytes'] / 1024:>10.1f} {change:>12}"
+            + ("  REGRESSED" if problems else "")
+        )
+
+    if args.update:
+        benchmarks = {**recorded, **results}
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(
+                {"environment": _environment(), "benchmarks": benchmarks},
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    missing = [name for name in results if name not in recorded]
+    if missing:
+        print(f"No baseline for: {', '.join(missing)} (run with --update)")
+
+    if failed:
+        print(
+            f"\n{len(failed)} benchmark(s) regressed by more than {args.threshold:.0%}:"
+        )
+        for name, problems in failed:
+            print(f"  {name}: {'; '.join(problems)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 import base64
 
 import streamlit as st
+from utils.api_client import get_preview_page
 from utils.state_manager import get_state
 
 
@@ -9,11 +10,32 @@ def render_preview_panel():
 
     preview_image = get_state("preview_image")
     latex_content = get_state("latex_content")
+    page_count = get_state("preview_page_count", 1)
 
     if preview_image:
         try:
-            image_data = base64.b64decode(preview_image)
-            st.image(image_data, caption="Resume Preview", use_container_width=True)
+            page = 1
+            if page_count > 1:
+                page = st.radio(
+                    "Page",
+                    list(range(1, page_count + 1)),
+                    horizontal=True,
+                    key="preview_page",
+                )
+
+            high_res = st.toggle("🔍 High resolution", key="preview_high_res")
+            tier = "high" if high_res else "low"
+
+            if page == 1 and tier == "low":
+                image_data = base64.b64decode(preview_image)
+            else:
+                image_data = _load_page(page, tier)
+
+            st.image(
+                image_data,
+                caption=f"Resume Preview (page {page} of {page_count})",
+                use_container_width=True,
+            )
         except Exception as e:
             st.error(f"Error displaying preview: {e}")
     else:
@@ -30,3 +52,13 @@ def render_preview_panel():
     if latex_content:
         with st.expander("📄 View LaTeX Source"):
             st.code(latex_content, language="latex")
+
+
+def _load_page(page: int, tier: str) -> bytes:
+    # Pages are fetched on first view and kept for the rest of the session
+    pages = get_state("preview_pages", {})
+    if (page, tier) not in pages:
+        pages[(page, tier)] = get_preview_page(
+            get_state("preview_document_id"), page, tier
+        )
+    return pages[(page, tier)]
@@ -1,5 +1,6 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
+import httpx
 import streamlit as st
 from components.education_section import render_education_section
 from components.experience_section import render_experience_section
@@ -8,15 +9,17 @@ from components.preview_panel import render_preview_panel
 from components.projects_section import render_projects_section
 from components.skills_section import render_skills_section
 from utils.api_client import (
-    compile_latex_to_pdf,
     compile_resume_data,
+    export_pdf,
     generate_latex,
+    list_templates,
     update_resume,
 )
 from utils.state_manager import (
     get_default_resume_data,
     get_state,
     mark_clean,
+    mark_dirty,
     set_state,
 )
 
@@ -44,7 +47,7 @@ def render_editor_page():
 
         with btn_col2:
             if st.button("🔄 Preview"):
-                generate_preview(resume_data)
+                generate_preview(resume_data, resume_id)
 
         with btn_col3:
             if st.button("📥 PDF"):
@@ -57,6 +60,11 @@ def render_editor_page():
         if get_state("is_dirty", False):
             st.caption("⚠️ Unsaved changes")
 
+        template = render_template_select(resume_data.get("template", "classic"))
+        if template != resume_data.get("template", "classic"):
+            resume_data["template"] = template
+            mark_dirty()
+
         st.markdown("---")
 
         tab_header, tab_edu, tab_skills, tab_exp, tab_proj = st.tabs(
@@ -92,6 +100,22 @@ def render_editor_page():
         render_preview_panel()
 
 
+def render_template_select(current: str) -> str:
+    try:
+        templates = list_templates()
+    except Exception:
+        return current
+
+    titles = {template["name"]: template["title"] for template in templates}
+    names = list(titles)
+    return st.selectbox(
+        "Template",
+        names,
+        index=names.index(current) if current in names else 0,
+        format_func=lambda name: titles[name],
+    )
+
+
 def save_resume(resume_id: str, resume_data: Dict[str, Any]):
     try:
         update_resume(resume_id, data=resume_data)
@@ -101,14 +125,28 @@ def save_resume(resume_id: str, resume_data: Dict[str, Any]):
         st.error(f"Error saving: {e}")
 
 
-def generate_preview(resume_data: Dict[str, Any]):
+def generate_preview(resume_data: Dict[str, Any], resume_id: Optional[str] = None):
     try:
         with st.spinner("Generating preview..."):
-            result = compile_resume_data(resume_data)
+            result = compile_resume_data(resume_data, resume_id)
             set_state("preview_image", result["image"])
+            set_state("preview_document_id", result.get("document_id"))
+            set_state("preview_page_count", result.get("page_count") or 1)
+            set_state("preview_pages", {})
+            set_state("preview_page", 1)
             set_state("latex_content", result["latex"])
             st.success("Preview updated!")
             st.rerun()
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code != 422:
+            st.error(f"Error generating preview: {e}")
+            return
+        st.error("LaTeX compilation failed:")
+        for error in e.response.json()["detail"]["errors"]:
+            location = error["field"] or (
+                f"line {error['line']}" if error["line"] else ""
+            )
+            st.markdown(f"- **{location or 'document'}**: {error['message']}")
     except Exception as e:
         st.error(f"Error generating preview: {e}")
 
@@ -116,8 +154,7 @@ def generate_preview(resume_data: Dict[str, Any]):
 def download_pdf(resume_data: Dict[str, Any]):
     try:
         with st.spinner("Generating PDF..."):
-            latex = generate_latex(resume_data)
-            pdf_bytes = compile_latex_to_pdf(latex)
+            pdf_bytes = export_pdf(resume_data)
 
             st.download_button(
                 label="⬇️ Download PDF",
@@ -4,6 +4,7 @@ from utils.api_client import (
     create_resume,
     delete_profile,
     delete_resume,
+    export_profile_zip,
     list_profiles,
     list_resumes,
 )
@@ -79,6 +80,19 @@ def render_profiles_page():
                 resumes = list_resumes(profile["id"])
                 if resumes:
                     st.caption(f"📄 {len(resumes)} resume(s)")
+                    if st.button("📦 Export all as ZIP", key=f"export_{profile['id']}"):
+                        try:
+                            with st.spinner("Compiling resumes..."):
+                                archive = export_profile_zip(profile["id"])
+                            st.download_button(
+                                label="⬇️ Download ZIP",
+                                data=archive,
+                                file_name=f"{profile['name']}.zip",
+                                mime="application/zip",
+                                key=f"download_zip_{profile['id']}",
+                            )
+                        except Exception as e:
+                            st.error(f"Error exporting resumes: {e}")
                     for resume in resumes:
                         resume_col1, resume_col2, resume_col3 = st.columns([3, 1, 1])
                         with resume_col1:
@@ -1,3 +1,4 @@
+import time
 from typing import Any, Dict, List, Optional
 
 import httpx
@@ -90,18 +91,37 @@ def delete_resume(resume_id: str) -> None:
         response.raise_for_status()
 
 
-def compile_resume_data(data: Dict[str, Any]) -> Dict[str, Any]:
+def compile_resume_data(
+    data: Dict[str, Any], resume_id: Optional[str] = None
+) -> Dict[str, Any]:
+    params = {"resume_id": resume_id} if resume_id else None
+    with get_client() as client:
+        response = client.post("/compile-data", json=data, params=params, timeout=120.0)
+        response.raise_for_status()
+        return response.json()
+
+
+def get_preview_page(document_id: str, page: int, tier: str = "low") -> bytes:
+    with get_client() as client:
+        response = client.get(
+            f"/documents/{document_id}/pages/{page}", params={"tier": tier}
+        )
+        response.raise_for_status()
+        return response.content
+
+
+def list_templates() -> List[Dict[str, str]]:
     with get_client() as client:
-        response = client.post("/compile-data", json=data, timeout=120.0)
+        response = client.get("/templates")
         response.raise_for_status()
         return response.json()
 
 
 def generate_latex(data: Dict[str, Any]) -> str:
     with get_client() as client:
-        response = client.post("/generate-latex", json=data)
+        response = client.post("/generate-latex/stream", json=data)
         response.raise_for_status()
-        return response.json()["latex"]
+        return response.text
 
 
 def compile_latex_to_pdf(latex: str) -> bytes:
@@ -112,6 +132,47 @@ def compile_latex_to_pdf(latex: str) -> bytes:
         return response.content
 
 
+def export_profile_zip(profile_id: str) -> bytes:
+    with get_client() as client:
+        response = client.get(f"/profiles/{profile_id}/export.zip", timeout=300.0)
+        response.raise_for_status()
+        return response.content
+
+
+def create_compile_job(data: Dict[str, Any], output: str = "pdf") -> Dict[str, Any]:
+    with get_client() as client:
+        response = client.post("/compile-jobs", json={"data": data, "output": output})
+        response.raise_for_status()
+        return response.json()
+
+
+def get_compile_job(job_id: str) -> Dict[str, Any]:
+    with get_client() as client:
+        response = client.get(f"/compile-jobs/{job_id}")
+        response.raise_for_status()
+        return response.json()
+
+
+def get_compile_job_result(job_id: str) -> bytes:
+    with get_client() as client:
+        response = client.get(f"/compile-jobs/{job_id}/result")
+        response.raise_for_status()
+        return response.content
+
+
+def export_pdf(data: Dict[str, Any], timeout: float = 300.0) -> bytes:
+    # Polls with short requests instead of holding one connection open
+    job = create_compile_job(data, output="pdf")
+    deadline = time.monotonic() + timeout
+    while job["status"] in ("queued", "running"):
+        if time.monotonic() > deadline:
+            raise TimeoutError("PDF export did not finish in time")
+        time.sleep(0.5)
+        job = get_compile_job(job["id"])
+
+    return get_compile_job_result(job["id"])
+
+
 def health_check() -> bool:
     try:
         with get_client() as client:
@@ -31,6 +31,15 @@ def init_resume_state():
     if "preview_image" not in st.session_state:
         st.session_state.preview_image = None
 
+    if "preview_document_id" not in st.session_state:
+        st.session_state.preview_document_id = None
+
+    if "preview_page_count" not in st.session_state:
+        st.session_state.preview_page_count = 1
+
+    if "preview_pages" not in st.session_state:
+        st.session_state.preview_pages = {}
+
     if "latex_content" not in st.session_state:
         st.session_state.latex_content = None
 
@@ -40,6 +49,7 @@ def init_resume_state():
 
 def get_default_resume_data() -> Dict[str, Any]:
     return {
+        "template": "classic",
         "heading": {
             "name": "",
             "phone": "",
@@ -0,0 +1,186 @@
+"""
+Differential tests for escape_latex against the implementation it replaced.
+
+legacy_escape_latex is a frozen copy of escape_latex before it became a
+single regex pass. The rewrite must give the same output for every input,
+so any change to the escaping rules has to update this copy on purpose.
+"""
+
+import random
+import re
+import unittest
+from typing import List
+
+from backend.services.escape_latex import escape_latex, escape_latex_many
+
+# Special characters, whitespace, and letters that spell the commands the
+# old implementation blocked, so random text hits every rule
+ALPHABET = "\\_{}$%#&^~`\"' \t\n\x00abcdefilmnoprstuvwxBEINSTV0-:"
+WORDS = [
+    "\\input",
+    "\\write18",
+    "\\newcommand",
+    "\\renewcommand",
+    "\\def",
+    "\\catcode",
+    "\\begin{verbatim}",
+    "\\begin {equation}",
+    "\\ifx",
+    "% \\input",
+    "%\t\\def",
+    "%~",
+    "% `",
+    "100%",
+    "C#/F#",
+    "Zürich–東京 🚀",
+]
+CASES = [
+    "",
+    "plain text",
+    "\\",
+    "%\\",
+    "% \n \\input{/etc/passwd}",
+    "\\textbackslash{}",
+    "\"quoted\" and 'single'",
+    "50% off & $5 for #1_fan {now}^2 ~home `tick`",
+]
+
+
+def legacy_escape_latex(text: str) -> str:
+    if not text:
+        return ""
+
+    # Order matters! Backslash must be first
+    escaped = text
+
+    # Escape special characters
+    escaped = escaped.replace("\\", "\\textbackslash{}")  # Backslash
+    escaped = escaped.replace("_", "\\_")  # Underscore
+    escaped = escaped.replace("{", "\\{")  # Left brace
+    escaped = escaped.replace("}", "\\}")  # Right brace
+    escaped = escaped.replace("$", "\\$")  # Dollar sign
+    escaped = escaped.replace("%", "\\%")  # Percent sign
+    escaped = escaped.replace("#", "\\#")  # Hash
+    escaped = escaped.replace("&", "\\&")  # Ampersand
+    escaped = escaped.replace("^", "\\^{}")  # Caret (superscript)
+    escaped = escaped.replace("~", "\\textasciitilde{}")  # Tilde
+    escaped = escaped.replace("`", "\\textasciigrave{}")  # Backtick
+    escaped = escaped.replace('"', "''")  # Double quote
+    escaped = escaped.replace("'", "''")  # Single quote
+
+    # List of dangerous commands to block
+    dangerous_commands: List[str] = [
+        "write",
+        "read",
+        "openin",
+        "openout",
+        "input",
+        "include",
+        "import",
+        "usepackage",
+        "documentclass",
+        "lstinputlisting",
+        "verbatiminput",
+        "immediate",
+        "newcommand",
+        "renewcommand",
+        "def",
+        "let",
+        "futurelet",
+        "catcode",
+        "makeatletter",
+        "csname",
+        "endcsname",
+        "message",
+        "special",
+        "shell",
+        "ShellEscape",
+        "write18",
+        "PassOptionsToPackage",
+        "afterassignment",
+        "expandafter",
+    ]
+
+    # Block dangerous commands that might have been escaped
+    for command in dangerous_commands:
+        # Match the escaped backslash followed by command name
+        pattern = rf"\\textbackslash\{{\}}\s*({re.escape(command)})"
+        escaped = re.sub(pattern, r"[BLOCKED:\1]", escaped, flags=re.IGNORECASE)
+
+    # Block verbatim environments which could bypass escaping
+    verbatim_pattern = r"\\begin\s*\{\s*(verbatim|lstlisting|minted|alltt)\s*\}"
+    escaped = re.sub(
+        verbatim_pattern, "[BLOCKED:VERBATIM]", escaped, flags=re.IGNORECASE
+    )
+
+    # Block potentially dangerous math environments
+    math_environments = ["equation", "align", "displaymath", "math", "eqnarray"]
+    for env in math_environments:
+        pattern = rf"\\begin\s*\{{\s*{env}\s*\}}"
+        escaped = re.sub(pattern, f"[SANITIZED:{env}]", escaped, flags=re.IGNORECASE)
+
+    # Block attempts to use comments for injection
+    escaped = re.sub(r"\\%\s*(\\[a-zA-Z]+)", r"\\% [BLOCKED:\1]", escaped)
+
+    # Block attempts to create new commands
+    escaped = re.sub(
+        r"\\textbackslash\{\}(new|renew|provide)[a-zA-Z]*",
+        "[BLOCKED:COMMAND-DEFINITION]",
+        escaped,
+        flags=re.IGNORECASE,
+    )
+
+    # Block TeX primitives that could be used for injection
+    tex_primitives = [
+        "atop",
+        "above",
+        "over",
+        "mathchoice",
+        "discretionary",
+        "loop",
+        "repeat",
+        "unless",
+        "ifx",
+        "ifnum",
+    ]
+    for primitive in tex_primitives:
+        pattern = rf"\\textbackslash\{{\}}{primitive}"
+        escaped = re.sub(
+            pattern, f"[BLOCKED:{primitive}]", escaped, flags=re.IGNORECASE
+        )
+
+    return escaped
+
+
+def _random_text(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 8)):
+        if rng.random() < 0.3:
+            parts.append(rng.choice(WORDS))
+        else:
+            parts.append("".join(rng.choices(ALPHABET, k=rng.randint(0, 12))))
+    return "".join(parts)
+
+
+class EscapeLatexTest(unittest.TestCase):
+    def test_matches_legacy_on_known_cases(self):
+        for text in CASES + WORDS:
+            with self.subTest(text=text):
+                self.assertEqual(escape_latex(text), legacy_escape_latex(text))
+
+    def test_matches_legacy_on_random_text(self):
+        rng = random.Random(23)
+        for _ in range(10000):
+            text = _random_text(rng)
+            self.assertEqual(escape_latex(text), legacy_escape_latex(text), text)
+
+    def test_many_matches_legacy(self):
+        rng = random.Random(24)
+        for _ in range(1000):
+            texts = [_random_text(rng) for _ in range(rng.randint(0, 6))]
+            expected = [legacy_escape_latex(text) for text in texts]
+            self.assertEqual(escape_latex_many(texts), expected, texts)
+
+
+if __name__ == "__main__":
+    unittest.main()